@@ -0,0 +1,148 @@
+"""
+Batch analysis of positions by a pool of processes, streamed as JSONL.
+
+The positions are read one per line in the text notation of `Board.to_string` (empty lines and
+lines starting with "#" are skipped), from a file or from stdin. Every process keeps one engine,
+and its transposition table, killer moves and history, for all the positions it analyses. The
+results are written in the order of the input, one JSON object per line:
+
+    {"index": 0, "position": "...", "score": 310, "best_move": [5, 3, 4, 3],
+     "pv": [[5, 3, 4, 3], ...], "depth": 5, "nodes": 1234, "time": 0.05}
+
+A position that cannot be read or analysed gets {"index", "position", "error"} instead, and the
+analysis of the others goes on.
+
+Only a bounded number of positions is read ahead of the results written, so inputs of any size
+are analysed in constant memory.
+
+    python analyze.py positions.txt --depth 5 --processes 4 --output results.jsonl
+    cat positions.txt | python analyze.py - --time 0.5 > results.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+from parameters import DEPTH, MIN, MAX
+
+# Positions analysed ahead of the results written, per process
+READ_AHEAD = 16
+
+# The engine of the worker process, created by `init_worker`
+_engine = None
+
+
+def read_positions(lines):
+    """Generates the positions of the lines of the input, skipping empty lines and comments."""
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def init_worker(size: int) -> None:
+    """Creates the engine of a worker process, kept for all the positions it analyses."""
+    from engine import Engine
+
+    global _engine
+    _engine = Engine(size=size, workers=1, tt_file=None)
+
+
+def analyze_position(task) -> dict:
+    """
+    Analyses one position with the engine of the worker process.
+
+    Parameters:
+        task (tuple): The index of the position in the input, its text notation, the search depth
+                      and the time limit (or None).
+
+    Returns:
+        dict: The result of the position, with an "error" instead of a score when the position
+              cannot be read or its analysis fails, and a "winner" when the game is already over.
+    """
+    from states import Board
+
+    index, position, depth, time_limit = task
+    result = {"index": index, "position": position}
+    try:
+        board = Board.from_string(position)
+    except ValueError as error:
+        result["error"] = f"invalid position: {error}"
+        return result
+
+    try:
+        winner = board.winner()
+        if winner:
+            result["winner"] = winner
+            return result
+        start_time = time.time()
+        searched = _engine.think(board, depth, MIN, MAX, time_limit=time_limit)
+    except Exception as error:
+        # Only this position is lost, the others are still analysed
+        result["error"] = f"{type(error).__name__}: {error}"
+        return result
+    result.update(
+        {
+            "score": searched.score,
+            "best_move": list(searched.best_move) if searched.best_move is not None else None,
+            "pv": [list(move) for move in searched.pv],
+            "depth": searched.depth,
+            "nodes": _engine.nodes,
+            "time": round(time.time() - start_time, 4),
+        }
+    )
+    return result
+
+
+def analyze(
+    positions, depth: int = DEPTH, time_limit=None, processes: int = None, size: int = 2**18
+):
+    """
+    Analyses positions with a pool of processes.
+
+    Parameters:
+        positions (Iterable[str]): The positions, in the text notation of `Board.to_string`.
+        depth (int): The search depth (the maximum depth when there is a time limit).
+        time_limit (float): Optional time budget of every position, in seconds.
+        processes (int): Number of processes, by default one per CPU.
+        size (int): Size of the transposition table of every process.
+
+    Returns:
+        Iterator[dict]: The results, in the order of the positions, see `analyze_position`.
+    """
+    processes = processes or os.cpu_count()
+    with Pool(processes, initializer=init_worker, initargs=(size,)) as pool:
+        # Results of the positions sent to the pool and not yielded yet, oldest first
+        pending = deque()
+        limit = READ_AHEAD * processes
+        for index, position in enumerate(positions):
+            pending.append(
+                pool.apply_async(analyze_position, ((index, position, depth, time_limit),))
+            )
+            if len(pending) >= limit:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fianco batch position analysis")
+    parser.add_argument("input", help="file of positions, one per line, or - for stdin")
+    parser.add_argument("--depth", type=int, default=DEPTH)
+    parser.add_argument("--time", type=float, default=None, help="seconds per position")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--size", type=int, default=2**18, help="transposition table entries per process")
+    parser.add_argument("--output", default="-", help="JSONL file of the results, or - for stdout")
+    args = parser.parse_args()
+
+    input = sys.stdin if args.input == "-" else open(args.input)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    with input, output:
+        for result in analyze(
+            read_positions(input), args.depth, args.time, args.processes, args.size
+        ):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
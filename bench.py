@@ -0,0 +1,262 @@
+"""
+Search benchmark on a fixed set of positions.
+
+Every position is searched with `Engine.think` at depths 1, 2, ... up to the benchmark depth,
+keeping the transposition table between the depths as iterative deepening does. The nodes, the
+nodes per second, the time to complete every depth, the transposition table hit rate and the best
+move and score are written to a JSON file. The Zobrist keys are seeded (ZOBRIST_SEED), so the
+nodes and the moves are the same in every run: two result files can be compared to find the
+positions where a change altered the search, or made it slower.
+
+With --imports, the time to import the engine modules in a new interpreter is measured too, as
+engine processes pay it at every start, and a module loading pygame is reported.
+
+    python bench.py --depth 5 --output bench.json
+    python bench.py --depth 5 --output new.json --compare bench.json
+    python bench.py --depth 5 --imports 10 --output new.json --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import parameters
+from parameters import SIZE, MIN, MAX, ZOBRIST_SEED
+from states import Board
+
+# Curated positions: opening, middlegame, forced captures and endgame
+BENCH_POSITIONS = [
+    ("initial", "bbbbbbbbb/1b5b1/2b3b2/3b1b3/9/3w1w3/2w3w2/1w5w1/wwwwwwwww w"),
+    ("opening", "b1bb1bbbb/1bbb3b1/2b4b1/3b1b3/9/3w1w3/1w1w2w2/1w6w/1wwwwwwww w"),
+    ("middlegame", "bb1bbbbbb/1bb6/2b6/6bb1/9/2ww5/9/ww3w1w1/1wwww1www w"),
+    ("captures", "bbb1bbbbb/1bb4b1/2b2b3/5b3/4b4/4www2/2w4w1/1w2ww3/wwww2www w"),
+    ("race", "9/1w7/9/4b4/3w5/9/9/7b1/9 b"),
+]
+
+# A position searched this much slower than in the compared results (and at least
+# MIN_SLOWDOWN seconds slower, to ignore the noise of the quick ones) is reported
+SLOWDOWN = 1.10
+MIN_SLOWDOWN = 0.05
+
+# Modules imported by headless engine processes, which must not load pygame
+HEADLESS_MODULES = ("engine", "protocol", "selfplay", "tablebase")
+# An import this much slower than in the compared results is reported
+MIN_IMPORT_SLOWDOWN = 0.01
+
+
+def random_positions(count: int, seed: int):
+    """Generates (name, position) pairs by playing 8 to 30 random moves from the initial position."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = Board(team=1, turn=1)
+        board.create_boards()
+        for _ in range(rng.randint(8, 30)):
+            moves = board.legal_moves()
+            if not moves or board.winner():
+                break
+            board.move_pieces(*rng.choice(moves))
+        if not board.winner():
+            positions.append((f"random-{seed}-{len(positions)}", board.to_string()))
+    return positions
+
+
+def bench_position(name: str, position: str, depth: int, size: int) -> dict:
+    """
+    Searches a position up to `depth` with a new engine.
+
+    Returns:
+        dict: The results of the position.
+    """
+    from engine import Engine
+
+    engine = Engine(size=size, reset_table=False, workers=1, tt_file=None, tablebase_dir=None)
+    board = Board.from_string(position)
+    nodes, probes, hits = 0, 0, 0
+    time_to_depth = []
+    start_time = time.time()
+    for d in range(1, depth + 1):
+        result = engine.think(board, d, MIN, MAX)
+        nodes += engine.nodes
+        probes += engine.tt_probes
+        hits += engine.tt_hits
+        time_to_depth.append(round(time.time() - start_time, 4))
+    elapsed_time = time.time() - start_time
+    engine.close()
+
+    return {
+        "name": name,
+        "position": position,
+        "depth": depth,
+        "best_move": list(result.best_move) if result.best_move is not None else None,
+        "score": result.score,
+        "nodes": nodes,
+        "time": round(elapsed_time, 4),
+        "nps": round(nodes / max(elapsed_time, 1e-9)),
+        "time_to_depth": time_to_depth,
+        "tt_hit_rate": round(hits / probes, 4) if probes else None,
+    }
+
+
+def import_time(module: str, runs: int) -> dict:
+    """
+    Measures the time to import a module in `runs` new interpreters.
+
+    Returns:
+        dict: The module, the median import time and whether the import loaded pygame.
+    """
+    code = (
+        "import sys, time\n"
+        "start_time = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - start_time, 'pygame' in sys.modules)"
+    )
+    times, pygame = [], False
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        times.append(float(output[-2]))
+        pygame = pygame or output[-1] == "True"
+    return {"module": module, "time": round(statistics.median(times), 4), "pygame": pygame}
+
+
+def compare(results: dict, previous: dict) -> int:
+    """
+    Prints the positions whose nodes, best move or score differ from the previous results,
+    or that were searched more than SLOWDOWN times slower, and the imports that load pygame
+    or became more than SLOWDOWN times slower.
+
+    Returns:
+        int: The number of positions and imports reported.
+    """
+    old = {result["name"]: result for result in previous["positions"]}
+    reported = 0
+    for result in results["positions"]:
+        before = old.get(result["name"])
+        if before is None or before["depth"] != result["depth"]:
+            continue
+        changes = [
+            f"{key}: {before[key]} -> {result[key]}"
+            for key in ("nodes", "best_move", "score")
+            if before[key] != result[key]
+        ]
+        if (
+            result["time"] > before["time"] * SLOWDOWN
+            and result["time"] - before["time"] > MIN_SLOWDOWN
+        ):
+            changes.append(f"time: {before['time']}s -> {result['time']}s")
+        if changes:
+            reported += 1
+            print(f"{result['name']}: " + ", ".join(changes))
+
+    old = {result["module"]: result for result in previous.get("imports", [])}
+    for result in results.get("imports", []):
+        before = old.get(result["module"])
+        if result["pygame"]:
+            reported += 1
+            print(f"import {result['module']}: loads pygame")
+        elif (
+            before is not None
+            and result["time"] > before["time"] * SLOWDOWN
+            and result["time"] - before["time"] > MIN_IMPORT_SLOWDOWN
+        ):
+            reported += 1
+            print(f"import {result['module']}: {before['time']}s -> {result['time']}s")
+    print(f"{reported} changes reported")
+    return reported
+
+
+def bench(
+    depth: int, positions, size: int, output: str, previous: str = None, imports: int = 0
+) -> dict:
+    """
+    Runs the benchmark on the positions, prints a line per position and the totals,
+    and writes the results to `output`.
+
+    Parameters:
+        depth (int): The search depth.
+        positions (List[Tuple]): The (name, position) pairs to search.
+        size (int): The size of the transposition table.
+        output (str): Path of the JSON file of the results.
+        previous (str): Optional path of earlier results to compare with.
+        imports (int): Number of new interpreters measuring the import time of every module
+                       of HEADLESS_MODULES, or 0 not to measure it.
+
+    Returns:
+        dict: The results.
+    """
+    results = {
+        "depth": depth,
+        "zobrist_seed": ZOBRIST_SEED,
+        "settings": {
+            name: getattr(parameters, name)
+            for name in (
+                "TT",
+                "AS",
+                "MULTICUT",
+                "DEPTH_EXTENSION",
+                "QUIESCENCE",
+                "LMR",
+                "FUTILITY",
+                "RAZORING",
+                "MIRROR_TT",
+                "ORDENING",
+            )
+        },
+        "positions": [],
+    }
+    for name, position in positions:
+        result = bench_position(name, position, depth, size)
+        results["positions"].append(result)
+        print(
+            f"{name:>14}  nodes: {result['nodes']:9d}  time: {result['time']:8.3f}s  "
+            f"nps: {result['nps']:7d}  tt hits: {result['tt_hit_rate']}  "
+            f"best move: {result['best_move']}  score: {result['score']}"
+        )
+
+    nodes = sum(result["nodes"] for result in results["positions"])
+    elapsed_time = sum(result["time"] for result in results["positions"])
+    results["nodes"] = nodes
+    results["time"] = round(elapsed_time, 4)
+    results["nps"] = round(nodes / max(elapsed_time, 1e-9))
+    print("-" * 50)
+    print(f"Total nodes: {nodes}  time: {elapsed_time:.3f}s  nps: {results['nps']}")
+
+    if imports:
+        results["imports"] = [import_time(module, imports) for module in HEADLESS_MODULES]
+        for result in results["imports"]:
+            print(
+                f"import {result['module']:>10}  time: {result['time']:.4f}s"
+                + ("  (loads pygame)" if result["pygame"] else "")
+            )
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    if previous is not None:
+        with open(previous) as f:
+            compare(results, json.load(f))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fianco search benchmark")
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--random", type=int, default=0, help="number of extra random positions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=SIZE)
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--compare", help="results of an earlier run to compare with")
+    parser.add_argument("--imports", type=int, default=0, help="interpreters measuring the import time")
+    args = parser.parse_args()
+
+    positions = BENCH_POSITIONS + random_positions(args.random, args.seed)
+    bench(args.depth, positions, args.size, args.output, args.compare, args.imports)
@@ -0,0 +1,163 @@
+"""
+Bitboard helpers for the 9x9 Fianco board.
+
+Every colour is stored as a single Python integer where bit ``i * 9 + j`` is set
+when the square in row ``i`` and column ``j`` holds one of its pieces. Moves are
+computed for all the pieces of a side at once with shifts and masks: moving one
+row up is a shift right by 9, one column to the left a shift right by 1, and so on.
+
+The side that plays as ``team`` moves up the board (towards row 0), the other
+side moves down (towards row 8), mirroring the ``direction`` used by ``Board``.
+"""
+
+N = 9
+NUM_SQUARES = N * N
+FULL = (1 << NUM_SQUARES) - 1
+
+# Precomputed (row, column) of every square index
+SQUARES = [divmod(s, N) for s in range(NUM_SQUARES)]
+
+
+def square(i: int, j: int) -> int:
+    """Returns the bit index of the square in row ``i`` and column ``j``."""
+    return i * N + j
+
+
+def bit(i: int, j: int) -> int:
+    """Returns the single-bit mask of the square in row ``i`` and column ``j``."""
+    return 1 << (i * N + j)
+
+
+def _mask(rows, cols) -> int:
+    value = 0
+    for i in rows:
+        for j in cols:
+            value |= bit(i, j)
+    return value
+
+
+ROWS = [_mask([i], range(N)) for i in range(N)]
+COLS = [_mask(range(N), [j]) for j in range(N)]
+
+NOT_COL_A = FULL ^ COLS[0]
+NOT_COL_I = FULL ^ COLS[N - 1]
+
+# Squares a piece can capture from, per side and diagonal
+CAPTURE_UP_LEFT = _mask(range(2, N), range(2, N))
+CAPTURE_UP_RIGHT = _mask(range(2, N), range(0, N - 2))
+CAPTURE_DOWN_LEFT = _mask(range(0, N - 2), range(2, N))
+CAPTURE_DOWN_RIGHT = _mask(range(0, N - 2), range(0, N - 2))
+
+# Squares on which a piece can be captured at all (not on the border)
+INNER = _mask(range(1, N - 1), range(1, N - 1))
+
+# Shift needed to reach the destination (and the jumped square) of each move
+UP, DOWN = -N, N
+LEFT, RIGHT = -1, 1
+
+
+def shift(bb: int, offset: int) -> int:
+    """Shifts every bit of ``bb`` by ``offset`` squares, dropping the bits leaving the board."""
+    if offset >= 0:
+        return (bb << offset) & FULL
+    return bb >> -offset
+
+
+def iter_bits(bb: int):
+    """Yields the index of every set bit of ``bb``, from the lowest to the highest."""
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def quiet_targets(own: int, empty: int, up: bool):
+    """
+    Computes the destinations of the non-capturing moves of a side.
+
+    Returns:
+        tuple: ``(forward, left, right)`` bitboards of reachable empty squares.
+    """
+    forward = (own >> N) & empty if up else (own << N) & empty
+    left = ((own & NOT_COL_A) >> 1) & empty
+    right = ((own & NOT_COL_I) << 1) & empty
+    return forward, left, right
+
+
+def capture_targets(own: int, opp: int, empty: int, up: bool):
+    """
+    Computes the destinations of the capturing moves of a side.
+
+    Returns:
+        tuple: ``(left, right)`` bitboards of landing squares of the diagonal jumps.
+    """
+    if up:
+        left = ((own & CAPTURE_UP_LEFT) >> 20) & (opp >> 10) & empty
+        right = ((own & CAPTURE_UP_RIGHT) >> 16) & (opp >> 8) & empty
+    else:
+        left = ((own & CAPTURE_DOWN_LEFT) << 16) & (opp << 8) & empty
+        right = ((own & CAPTURE_DOWN_RIGHT) << 20) & (opp << 10) & empty
+    return left, right
+
+
+def generate_captures(own: int, opp: int, up: bool):
+    """
+    Generates the capturing moves of a side as ``(oi, oj, i, j)`` tuples sorted by origin square.
+
+    Parameters:
+        own (int): Bitboard of the pieces of the side to move.
+        opp (int): Bitboard of the opponent's pieces.
+        up (bool): Whether the side to move advances towards row 0.
+    """
+    left, right = capture_targets(own, opp, FULL ^ (own | opp), up)
+    if not (left or right):
+        return []
+    d_left, d_right = (-20, -16) if up else (16, 20)
+    moves = []
+    for targets, delta in ((left, d_left), (right, d_right)):
+        for s in iter_bits(targets):
+            moves.append((s - delta, s))
+    moves.sort(key=_origin)
+    return [SQUARES[o] + SQUARES[s] for o, s in moves]
+
+
+def generate_quiets(own: int, opp: int, up: bool):
+    """
+    Generates the non-capturing moves of a side as ``(oi, oj, i, j)`` tuples sorted by origin
+    square, ignoring the mandatory capture rule.
+    """
+    forward, left, right = quiet_targets(own, FULL ^ (own | opp), up)
+    moves = []
+    for targets, delta in ((forward, UP if up else DOWN), (left, LEFT), (right, RIGHT)):
+        for s in iter_bits(targets):
+            moves.append((s - delta, s))
+    moves.sort(key=_origin)
+    return [SQUARES[o] + SQUARES[s] for o, s in moves]
+
+
+def generate_moves(own: int, opp: int, up: bool):
+    """
+    Generates the legal moves of a side, honouring the mandatory capture rule.
+
+    Moves are returned as ``(oi, oj, i, j)`` tuples sorted by origin square, and for each
+    piece in the same order used by ``Board.possible_moves_f``.
+
+    Parameters:
+        own (int): Bitboard of the pieces of the side to move.
+        opp (int): Bitboard of the opponent's pieces.
+        up (bool): Whether the side to move advances towards row 0.
+
+    Returns:
+        List[Tuple]: The list of legal moves.
+    """
+    return generate_captures(own, opp, up) or generate_quiets(own, opp, up)
+
+
+def _origin(move):
+    return move[0]
+
+
+def has_capture(own: int, opp: int, up: bool) -> bool:
+    """Checks whether the side owning ``own`` has at least one capture available."""
+    left, right = capture_targets(own, opp, FULL ^ (own | opp), up)
+    return bool(left or right)
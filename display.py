@@ -0,0 +1,103 @@
+"""
+Rendering of the board with pygame, kept apart from the game logic of states.py so that the
+engine can be imported, and run headless, without loading pygame.
+"""
+
+import pygame
+from states import Board
+from records import COLUMN_LABELS, row_labels
+
+
+class PygameEnviroment:  # class for the pygame enviroment
+    def __init__(self, board_obj: Board) -> None:
+        self.board_obj = board_obj
+        self.selected_piece = None
+
+    def show(self, screen, screen_size, grid_size, cell_size, PCOLOR):
+        font = pygame.font.Font(None, 36)
+        # Coordinates of the squares, shared with the notation of records.py
+        letters = COLUMN_LABELS
+        numbers = row_labels(PCOLOR, self.board_obj.team)
+        purple_color = (128, 0, 128)
+
+        for i in range(9):
+            for j in range(9):
+                square = self.board_obj.board[i, j]
+
+                color = (0, 0, 0)
+                if square == 1 or square == 2:
+                    if PCOLOR == 1:
+                        pygame.draw.circle(
+                            screen,
+                            color,
+                            (
+                                j * cell_size + cell_size // 2,
+                                i * cell_size + cell_size // 2,
+                            ),
+                            cell_size // 2 - 5,
+                            4 if square == 1 else 0,
+                        )
+
+                    else:
+                        pygame.draw.circle(
+                            screen,
+                            color,
+                            (
+                                j * cell_size + cell_size // 2,
+                                i * cell_size + cell_size // 2,
+                            ),
+                            cell_size // 2 - 5,
+                            0 if square == 1 else 4,
+                        )
+
+        if self.selected_piece is not None:
+            pygame.draw.circle(
+                screen,
+                purple_color,
+                (
+                    self.selected_piece[1] * cell_size + cell_size / 2,
+                    self.selected_piece[0] * cell_size + cell_size / 2,
+                ),
+                cell_size // 5 - 5 + 4,
+            )
+            if (
+                self.selected_piece[0],
+                self.selected_piece[1],
+            ) in self.board_obj.possible_moves:
+                for move in self.board_obj.possible_moves[
+                    (self.selected_piece[0], self.selected_piece[1])
+                ]:
+
+                    if self.board_obj.possible_moves[
+                        (self.selected_piece[0], self.selected_piece[1])
+                    ][move]:
+                        center = (
+                            move[1] * cell_size + cell_size // 2,
+                            move[0] * cell_size + cell_size // 2,
+                        )
+                        pygame.draw.circle(screen, (0, 255, 0), center, 15)
+
+        for x in range(0, grid_size, cell_size):
+            for y in range(0, grid_size, cell_size):
+                rect = pygame.Rect(x, y, cell_size, cell_size)
+                pygame.draw.rect(screen, purple_color, rect, 1)
+
+                col = x // cell_size
+                row = y // cell_size
+                notation = f"{letters[col]}{numbers[row]}"
+
+                text = font.render(notation, True, (0, 0, 0))
+                text_rect = text.get_rect(
+                    center=(x + cell_size // 2, y + cell_size // 2)
+                )
+                screen.blit(text, text_rect)
+        if PCOLOR == 1:
+
+            player_text = "White's Turn" if self.board_obj.turn == 1 else "Black's Turn"
+        else:
+            player_text = "Black's Turn" if self.board_obj.turn == 1 else "White's Turn"
+        player_text_rendered = font.render(player_text, True, (0, 0, 0))
+        player_text_rect = player_text_rendered.get_rect(
+            center=(screen_size[0] - 80, screen_size[1] - 20)
+        )
+        screen.blit(player_text_rendered, player_text_rect)
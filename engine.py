@@ -1,10 +1,14 @@
-from states import Board
-import numpy as np
+from states import Board, ZOBRIST_TABLE, mirror_move
+from bitboard import has_capture
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from tablebase import Tablebase
+from stats import SearchStats
 import math
 import time
 import copy
-import heapq
+import logging
 from collections import defaultdict, OrderedDict
+from itertools import islice
 from parameters import (
     ORDENING,
     TT,
@@ -17,8 +21,33 @@ from parameters import (
     DELTA,
     MAX_DEPTH,
     RESET_TABLE,
+    TT_FILE,
+    MIRROR_TT,
+    TABLEBASE_DIR,
+    BUCKET_SIZE,
+    SMP,
+    WORKERS,
+    STATS,
+    QUIESCENCE,
+    QS_DELTA,
+    PVS,
+    PV_LENGTH,
+    LMR,
+    LMR_DEPTH,
+    LMR_MOVES,
+    LMR_REDUCTION,
+    FUTILITY,
+    FUTILITY_MARGINS,
+    RAZORING,
+    RAZOR_MARGINS,
 )
 
+logger = logging.getLogger(__name__)
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time limit given to `Engine.think` is exceeded."""
+
 
 class Engine:
     """
@@ -27,7 +56,18 @@ class Engine:
     """
 
     def __init__(
-        self, size: int = 4000, p: float = 0.75, reset_table: bool = True
+        self,
+        size: int = 4000,
+        p: float = 0.75,
+        reset_table: bool = RESET_TABLE,
+        bucket_size: int = BUCKET_SIZE,
+        table=None,
+        workers: int = None,
+        tt_file: str = TT_FILE,
+        tablebase_dir: str = TABLEBASE_DIR,
+        stats: bool = STATS,
+        callback=None,
+        progress=None,
     ) -> None:
         """
         Initialize the Engine with transposition table settings, zobrist hashing,
@@ -35,8 +75,21 @@ class Engine:
 
         Parameters:
             size (int): Size of the transposition table.
-            p (float): Percentage of table to retain during optimization.
-            reset_table (bool): Whether to reset the transposition table after each move.
+            p (float): Percentage of table to retain during optimization, and when a table file is reloaded.
+            reset_table (bool): Whether to reset the transposition table after each move. When False the
+                                table is kept from move to move, and entries of older searches are replaced first.
+            bucket_size (int): Number of entries per bucket of the transposition table.
+            table (np.ndarray): Optional (size, 2) uint64 array backing the transposition table.
+            workers (int): Number of processes searching in parallel with Lazy SMP. Defaults to
+                           WORKERS when SMP is enabled, 1 (search in this process) otherwise.
+            tt_file (str): Optional path of a file backing the transposition table, so that it is kept
+                           across runs. The deepest entries of an existing file are reused.
+            tablebase_dir (str): Directory of the endgame tables (see `tablebase.py`). They are probed during
+                                 the search when the directory holds them, and ignored otherwise.
+            stats (bool): Whether to collect the statistics of every search (see `stats.SearchStats`).
+            callback (Callable): Optional function called with the statistics at the end of every search.
+            progress (Callable): Optional function called with the depth, the score and the principal variation
+                                 of every iteration completed by `iterative_deepening`.
         """
         # Transposition table and pruning structures
         self.size = size
@@ -49,24 +102,54 @@ class Engine:
         self.collisions = 0
         self.pruning_numbers = 0
 
-        # Zobrist hashing and transposition table setup
-        self.zobrist_table = np.random.randint(
-            0, 2**63 - 1, size=(9, 9, 3), dtype=np.int64
-        )
+        # Searched nodes and the time at which a timed search must stop (None for fixed-depth searches)
+        self.nodes = 0
+        # Per search counters: evaluated leaves, transposition table lookups, the ones that found the position
+        # and the ones that ended the search of a node, beta cutoffs and the ones caused by the first move
+        self.evaluations = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        # Nodes searched by the quiescence search, not counted in `nodes`
+        self.qnodes = 0
+        # Moves searched again with the full window after failing high on the null window of PVS
+        self.researches = 0
+        # Late quiet moves searched with a reduced depth, and moves and nodes cut by futility and razoring
+        self.reductions = 0
+        self.pruned = 0
+
+        # Statistics of the current search, per iteration, when enabled
+        self.collect_stats = stats
+        self.callback = callback
+        self.progress = progress
+        self.stats = None
+        self.deadline = None
+        # Set by another process to stop the search, see `smp.LazySMP`
+        self.stop_event = None
+
+        # Lazy SMP workers, started by the first search
+        self.workers = workers if workers is not None else (WORKERS if SMP else 1)
+        self.bucket_size = bucket_size
+        self.tt_file = tt_file
+        self.smp = None
+
+        # Zobrist hashing (the keys are shared with Board) and transposition table setup
+        self.zobrist_table = ZOBRIST_TABLE
         self.num_elements = 0
 
-        # Transposition table structure
-        dtype = np.dtype(
-            [
-                ("score", np.int32),
-                ("flag", "U10"),
-                ("upper_bound", np.int32),
-                ("lower_bound", np.int32),
-                ("depth", np.int8),
-                ("best_move", object),
-            ]
-        )
-        self.t_table = np.zeros(self.size, dtype=dtype)
+        # Transposition table structure: two packed 64-bit words per entry, see `TranspositionTable`
+        if tt_file is not None and table is None:
+            self.t_table = TranspositionTable.open(tt_file, self.size, bucket_size)
+            self.change_table()
+        else:
+            self.t_table = TranspositionTable(self.size, bucket_size, table)
+
+        # Endgame tables, memory-mapped
+        self.tablebase = Tablebase(tablebase_dir)
+        if not self.tablebase.pieces:
+            self.tablebase = None
 
     def aspirational_search(
         self, delta: int, max_depth: int, board: Board, d: int, alpha: int, beta: int
@@ -86,48 +169,47 @@ class Engine:
             beta (int): Upper bound of the alpha-beta search window.
 
         Returns:
-            tuple: Best score and board state found by the search at the given depth.
+            tuple: Best score and best move found by the search at the given depth.
         """
         guess = 0
 
         for d in range(1, max_depth + 1):
+            self.start_iteration(d)
 
             alpha = guess - delta
             beta = guess + delta
             if TT:
-                score, bestBoard = self.alpha_beta_Negamax_TT(board, d, alpha, beta)
-                self.clear_table()
+                score, bestMove = self.alpha_beta_Negamax_TT(board, d, alpha, beta)
             else:
-                score, bestBoard = self.alpha_beta_Negamax(board, d, alpha, beta)
+                score, bestMove = self.alpha_beta_Negamax(board, d, alpha, beta)
 
             score = -score
             if score <= alpha:
-                print("fail low, ", "score: ", score, "beta: ", alpha, "depth:", d)
+                logger.debug("fail low, score: %s, alpha: %s, depth: %s", score, alpha, d)
                 alpha = -math.inf
                 beta = score
 
                 if TT:  # Check if transposition table is enabled
-                    score, bestBoard = self.alpha_beta_Negamax_TT(board, d, alpha, beta)
-                    self.clear_table()
+                    score, bestMove = self.alpha_beta_Negamax_TT(board, d, alpha, beta)
                 else:
-                    score, bestBoard = self.alpha_beta_Negamax(board, d, alpha, beta)
+                    score, bestMove = self.alpha_beta_Negamax(board, d, alpha, beta)
                 self.pruning_numbers = 0
                 score = -score
 
             elif score >= beta:
-                print("fail high, ", "score: ", score, "beta: ", beta, "depth:", d)
+                logger.debug("fail high, score: %s, beta: %s, depth: %s", score, beta, d)
                 beta = math.inf
                 if TT:  # Check if transposition table is enabled
-                    score, bestBoard = self.alpha_beta_Negamax_TT(board, d, alpha, beta)
-                    self.clear_table()
+                    score, bestMove = self.alpha_beta_Negamax_TT(board, d, alpha, beta)
                 else:
-                    score, bestBoard = self.alpha_beta_Negamax(board, d, alpha, beta)
+                    score, bestMove = self.alpha_beta_Negamax(board, d, alpha, beta)
                 self.pruning_numbers = 0
                 score = -score
 
             guess = score
+            self.end_iteration()
 
-        return score, bestBoard
+        return score, bestMove
 
     def multi_cut(self, C, M, board: Board, depth: int, alpha: float, beta: float):
         """
@@ -142,7 +224,7 @@ class Engine:
             beta (float): The current upper bound of the search window.
 
         Returns:
-            (float, Board): A tuple containing the best score and the corresponding board state.
+            (float, Tuple): A tuple containing the best score and the corresponding move.
 
         This method works in two main phases:
 
@@ -155,17 +237,19 @@ class Engine:
         - If the multi-cut phase does not trigger early pruning, the function proceeds with a regular Alpha-Beta Negamax search,
             similar to the `alpha_beta_Negamax_TT` method.
         - For each remaining move, it calls the alpha-beta negamax search recursively to evaluate the board state.
-        - If a move's value exceeds the current best score, it updates the score and records the best move and board state.
+        - If a move's value exceeds the current best score, it updates the score and records the best move.
 
         """
 
-        boards = self.next_moves(board)
-        c = 0
-        m = 0
-        while len(boards) > 0 and m < M:
-            b, oi, oj, i, j = boards.pop(0)
+        # The reduced searches need a depth of at least 1, a shallower node is searched normally
+        if depth <= R + 1:
+            return self.alpha_beta_Negamax_TT(board, depth, alpha, beta)
 
-            value, _ = self.alpha_beta_Negamax_TT(b, depth - 1 - R, -beta, -alpha)
+        c = 0
+        for move in islice(self.move_picker(board, depth), M):
+            board.move_pieces(*move)
+            value, _ = self.alpha_beta_Negamax_TT(board, depth - 1 - R, -beta, -alpha)
+            board.undo_move()
             value = -value
 
             if value >= beta:
@@ -173,10 +257,8 @@ class Engine:
                 self.pruning_numbers += 1
 
                 if c >= C:
-                    return beta, b
+                    return beta, move
 
-            m += 1
-        self.clear_table()
         return self.alpha_beta_Negamax_TT(board, depth, alpha, beta)
 
     def alpha_beta_Negamax(self, board: Board, depth: int, alpha: float, beta: float):
@@ -194,49 +276,61 @@ class Engine:
         Returns:
             tuple: A tuple containing:
                 - score (float): The evaluated utility score for the current board state.
-                - bestBoard (Board): The best board state resulting from the evaluated moves.
+                - bestMove (Tuple): The best move (oi, oj, i, j) found, or None at the leaves.
 
+        The board is searched in place: every move is applied with `move_pieces` and reverted
+        with `undo_move` before the next one, so the board is unchanged on return.
         """
+        self.check_time()
+        if self.tablebase is not None:
+            tbScore = self.tablebase.probe(board)
+            if tbScore is not None:
+                return tbScore, None
         if depth == 0:
-            if board.turn == board.team:
-                board.utility_function()
-
-            else:
-                board.utility_function()
-                board.utility = -board.utility
-
-            return board.utility, board
+            if QUIESCENCE:
+                return self.quiescence(board, alpha, beta), None
+            return self.evaluate(board), None
 
         score = -math.inf
-        boards = self.next_moves(board)
-
-        for b, oi, oj, i, j in boards:
+        bestMove = None
+        for index, move in enumerate(self.move_picker(board, depth)):
+            board.move_pieces(*move)
             if DEPTH_EXTENSION:
-                if abs(oi - i) > 1:
-                    value, _ = self.alpha_beta_Negamax_TT(b, depth, -beta, -alpha)
+                if abs(move[0] - move[2]) > 1:
+                    value, _ = self.alpha_beta_Negamax_TT(board, depth, -beta, -alpha)
 
                 else:
-                    value, _ = self.alpha_beta_Negamax_TT(b, depth - 1, -beta, -alpha)
+                    value, _ = self.alpha_beta_Negamax_TT(
+                        board, depth - 1, -beta, -alpha
+                    )
 
             else:
-                value, _ = self.alpha_beta_Negamax(b, depth - 1, -beta, -alpha)
+                value, _ = self.alpha_beta_Negamax(board, depth - 1, -beta, -alpha)
+            board.undo_move()
 
             value = -value
             if value > score:
                 score = value
-                bestBoard = b
-                bestMove = (oi, oj, i, j)
+                bestMove = move
 
             alpha = max(alpha, score)
 
             if alpha >= beta:
                 if ORDENING["killer_moves"]:
-                    self.add_killer_move(depth, (board.zobrist, b.zobrist))
+                    self.add_killer_move(depth, (board.zobrist, move))
                 self.pruning_numbers += 1
+                self.beta_cutoffs += 1
+                if index == 0:
+                    self.first_move_cutoffs += 1
                 break
+
+        if bestMove is None:
+            # No legal moves
+            return self.evaluate(board), None
+
         if ORDENING["history_heuristic"]:
             self.add_history_heuristic((bestMove), depth)
-        return score, bestBoard
+        return score, bestMove
 
     def alpha_beta_Negamax_TT(
         self, board: Board, depth: int, alpha: float, beta: float
@@ -252,155 +346,352 @@ class Engine:
             beta (float): The current upper bound of the search window.
 
         Returns:
-            (float, Board): A tuple containing the best score evaluated and the corresponding board state after the best move.
+            (float, Tuple): A tuple containing the best score evaluated and the corresponding best move
+                            (oi, oj, i, j), or None at the leaves.
 
+        Like `alpha_beta_Negamax`, the board is searched in place and is unchanged on return.
         """
 
+        self.check_time()
+        # Positions with few pieces have an exact score in the endgame tables
+        if self.tablebase is not None:
+            tbScore = self.tablebase.probe(board)
+            if tbScore is not None:
+                return tbScore, None
+
         old_alpha = alpha
-        zobrist_key = board.zobrist
-        board.depth = depth
+        zobrist_key, mirrored = self.tt_key(board)
         ttEntry = self.get(zobrist_key)
-        if ttEntry["depth"] != 0:
-            if ttEntry["flag"] == "EXACT":
-                oi, oj, i, j = ttEntry["best_move"]
-                newBoard = board.create_new_board(oi, oj, i, j)
-                newBoard.zobrist = self.zobrist_hash(newBoard)
-                return ttEntry["score"], newBoard
-
-            elif ttEntry["flag"] == "LOWER_BOUND":
-                alpha = max(alpha, ttEntry["score"])
-                board.lower_bound = alpha
-            elif ttEntry["flag"] == "UPPER_BOUND":
-                beta = min(beta, ttEntry["score"])
-                board.upper_bound = beta
+        ttMove = None
+        if ttEntry is not None:
+            ttScore, ttFlag, ttDepth, ttMove = ttEntry
+            if mirrored and ttMove is not None:
+                ttMove = mirror_move(ttMove)
+        # Only entries searched at least as deep as this node can bound its score
+        if ttEntry is not None and ttDepth >= depth:
+            if ttFlag == EXACT:
+                self.tt_cutoffs += 1
+                return ttScore, ttMove
+
+            elif ttFlag == LOWER_BOUND:
+                alpha = max(alpha, ttScore)
+            elif ttFlag == UPPER_BOUND:
+                beta = min(beta, ttScore)
 
             if alpha >= beta:
-                return ttEntry["score"], board
+                self.tt_cutoffs += 1
+                return ttScore, ttMove
 
         if depth == 0:
-            if board.turn == board.team:
-                board.utility_function()
-
-            else:
-                board.utility_function()
-                board.utility = -board.utility
-
-            return board.utility, board
+            if QUIESCENCE:
+                return self.quiescence(board, alpha, beta), None
+            return self.evaluate(board), None
+
+        # Frontier pruning, only at nodes searched with a null window (off the principal variation)
+        # and without captures: a capture is forced, so every move of such a node is a capture
+        futile = False
+        if (
+            depth <= 2
+            and beta - alpha == 1
+            and (FUTILITY or RAZORING)
+            and not has_capture(
+                board.pieces[board.turn],
+                board.pieces[3 - board.turn],
+                board.turn == board.team,
+            )
+        ):
+            staticEval = self.evaluate(board)
+            # Razoring: far below alpha, only the captures of the quiescence search could save the node
+            if RAZORING and staticEval + RAZOR_MARGINS[depth] <= alpha:
+                value = (
+                    self.quiescence(board, alpha, beta) if QUIESCENCE else staticEval
+                )
+                if value <= alpha:
+                    self.pruned += 1
+                    return value, None
+            # Futility pruning: no quiet move can gain enough to bring the score up to alpha
+            futile = FUTILITY and staticEval + FUTILITY_MARGINS[depth] <= alpha
 
+        # The best move stored by a shallower search (e.g. the previous iteration) is searched first
         score = -math.inf
-        boards = self.next_moves(board)
-        for b, oi, oj, i, j in boards:
-            if DEPTH_EXTENSION:
-                if abs(oi - i) > 1:
-                    value, _ = self.alpha_beta_Negamax_TT(b, depth, -beta, -alpha)
-
-                else:
-                    value, _ = self.alpha_beta_Negamax_TT(b, depth - 1, -beta, -alpha)
+        bestMove = None
+        lastRow = 0 if board.turn == board.team else 8
+        killers = self.killerMoves.get(depth, ())
+        for index, move in enumerate(self.move_picker(board, depth, ttMove)):
+            # Late quiet moves: neither the first ones, captures, moves reaching the last row nor killers
+            late = (
+                index > 0
+                and (futile or (LMR and index >= LMR_MOVES and depth >= LMR_DEPTH))
+                and abs(move[0] - move[2]) < 2
+                and move[2] != lastRow
+                and (board.zobrist, move) not in killers
+            )
+            if late and futile:
+                # The move is not searched, but its score is bounded by the margin
+                self.pruned += 1
+                score = max(score, staticEval + FUTILITY_MARGINS[depth])
+                continue
+
+            board.move_pieces(*move)
+            if DEPTH_EXTENSION and abs(move[0] - move[2]) > 1:
+                childDepth = depth
             else:
-                value, _ = self.alpha_beta_Negamax_TT(b, depth - 1, -beta, -alpha)
-            value = -value
+                childDepth = depth - 1
+
+            if late:
+                # Late move reduction: a null window search at a reduced depth, which only stands
+                # if it fails low, otherwise the move is searched again at full depth
+                self.reductions += 1
+                value, _ = self.alpha_beta_Negamax_TT(
+                    board, childDepth - LMR_REDUCTION, -alpha - 1, -alpha
+                )
+                value = -value
+
+            if late and value <= alpha:
+                pass
+            elif PVS and index > 0:
+                # Principal Variation Search: a null window only proves the move is not better than
+                # the best one so far, and the move is searched again with the full window if it is
+                value, _ = self.alpha_beta_Negamax_TT(
+                    board, childDepth, -alpha - 1, -alpha
+                )
+                value = -value
+                if alpha < value < beta:
+                    self.researches += 1
+                    value, _ = self.alpha_beta_Negamax_TT(
+                        board, childDepth, -beta, -alpha
+                    )
+                    value = -value
+            else:
+                value, _ = self.alpha_beta_Negamax_TT(board, childDepth, -beta, -alpha)
+                value = -value
+            board.undo_move()
             if value > score:
                 score = value
-                bestMove = (oi, oj, i, j)
-                bestBoard = b
+                bestMove = move
 
             alpha = max(alpha, score)
 
             if alpha >= beta:
                 if ORDENING["killer_moves"]:
-                    self.add_killer_move(depth, (board.zobrist, b.zobrist))
+                    self.add_killer_move(depth, (board.zobrist, move))
                 self.pruning_numbers += 1
+                self.beta_cutoffs += 1
+                if index == 0:
+                    self.first_move_cutoffs += 1
 
                 break
-        board.flag = "EXACT"
+
+        if bestMove is None:
+            # No legal moves
+            return self.evaluate(board), None
+
+        flag = EXACT
         if score <= old_alpha:
-            board.flag = "UPPER_BOUND"
+            flag = UPPER_BOUND
         elif score >= beta:
-            board.flag = "LOWER_BOUND"
-        board.upper_bound = beta
-        board.lower_bound = alpha
-        board.best_move = bestMove
-        board.score = score
-        board.bestBoard = bestBoard
+            flag = LOWER_BOUND
 
         if ORDENING["history_heuristic"]:
             self.add_history_heuristic((bestMove), depth)
 
-        self.insert(board)
+        self.insert(
+            zobrist_key, score, flag, depth, mirror_move(bestMove) if mirrored else bestMove
+        )
 
-        return score, bestBoard
+        return score, bestMove
 
-    def next_moves(self, board: Board):
+    def check_time(self):
+        """
+        Counts a searched node and raises `SearchTimeout` once the deadline of a timed search has passed,
+        or when another process asked to stop. Both are only checked every 1024 nodes to keep the check cheap.
+        """
+        self.nodes += 1
+        if not self.nodes & 1023:
+            self.check_deadline()
+
+    def check_deadline(self):
+        """Raises `SearchTimeout` when the deadline of a timed search has passed, or another process asked to stop."""
+        if (self.deadline is not None and time.time() >= self.deadline) or (
+            self.stop_event is not None and self.stop_event.is_set()
+        ):
+            raise SearchTimeout()
+
+    def quiescence(self, board: Board, alpha: float, beta: float):
         """
-        Generates and classifies all possible moves for the current player's turn, applying move ordering
-        heuristics to prioritize moves and optimize the search process.
+        Searches the forced capture sequences at the horizon, so that leaves are only evaluated
+        in quiet positions instead of in the middle of a capture chain.
+
+        Captures are mandatory, so a player with a capture available must take one: such positions
+        are searched over their captures only. A player without captures can always stand pat, and
+        the position is evaluated statically. A capture position is not searched when even its static
+        evaluation plus QS_DELTA (more than any capture can gain) cannot reach alpha (delta pruning),
+        unless one of the captures reaches the last row.
+
+        Quiescence nodes are counted in `qnodes`, apart from the nodes of the main search.
+
+        Parameters:
+            board (Board): The current state of the game board, unchanged on return.
+            alpha (float): The current lower bound of the search window.
+            beta (float): The current upper bound of the search window.
+
+        Returns:
+            float: The score of the position from the point of view of the player to move.
+        """
+        self.qnodes += 1
+        if not self.qnodes & 1023:
+            self.check_deadline()
+
+        standPat = self.evaluate(board)
+        captures = board.capture_moves()
+        if not captures:
+            return standPat
+
+        # Delta pruning: no capture can bring the score up to alpha, unless it reaches the last row
+        if standPat + QS_DELTA <= alpha:
+            lastRow = 0 if board.turn == board.team else 8
+            if all(move[2] != lastRow for move in captures):
+                return standPat + QS_DELTA
+
+        score = -math.inf
+        for move in captures:
+            board.move_pieces(*move)
+            value = -self.quiescence(board, -beta, -alpha)
+            board.undo_move()
+            if value > score:
+                score = value
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        return score
+
+    def start_iteration(self, depth: int):
+        """Marks the start of the search of the root at `depth`, when statistics are collected."""
+        if self.stats is not None:
+            self.stats.start_iteration(self, depth)
+
+    def end_iteration(self, completed: bool = True):
+        """Records the statistics of the iteration started last, when statistics are collected."""
+        if self.stats is not None:
+            iteration = self.stats.end_iteration(self, completed)
+            logger.debug(
+                "depth %s: %s nodes in %.3f seconds",
+                iteration["depth"],
+                iteration["nodes"],
+                iteration["time"],
+            )
+
+    def reset_counters(self):
+        """Resets the counters of the search statistics."""
+        self.nodes = 0
+        self.qnodes = 0
+        self.researches = 0
+        self.reductions = 0
+        self.pruned = 0
+        self.evaluations = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def evaluate(self, board: Board):
+        """
+        Evaluates a leaf from the point of view of the player to move.
+
+        Parameters:
+            board (Board): The board to evaluate.
+
+        Returns:
+            int: The utility of the board, negated when it is the opponent's turn.
+        """
+        self.evaluations += 1
+        utility = board.utility_function()
+        if board.turn == board.team:
+            return utility
+        return -utility
+
+    def next_moves(self, board: Board, depth: int, tt_move=None):
+        """
+        Generates all the legal moves for the current player's turn in the order they are searched,
+        see `move_picker` for the move ordering heuristics.
 
         Parameters:
             board (Board): The current state of the game board.
+            depth (int): The remaining search depth, used to look up the killer moves.
+            tt_move (Tuple): The best move stored in the transposition table for the board, if any.
 
         Returns:
-            List[Tuple]: A list of possible board states after each move, prioritized by the following heuristics:
-                1. **Killer Moves**: Moves that have previously caused beta-cutoffs at the same depth, thus likely strong moves.
-                2. **Capture Moves**: Moves where the opponent's piece is captured.
-                3. **History Heuristic Moves**: Moves that have historically led to better outcomes in similar positions.
-                4. **Pruning Moves**: Moves that were previously pruned during search due to being unlikely to improve the current position.
-                5. **Regular Moves**: All remaining legal moves that do not fall into the above categories.
+            List[Tuple]: A list of possible moves (oi, oj, i, j).
+        """
+        return list(self.move_picker(board, depth, tt_move))
+
+    def move_picker(self, board: Board, depth: int, tt_move=None):
+        """
+        Lazily yields the legal moves for the current player's turn, applying move ordering heuristics
+        to prioritize moves and optimize the search process. The moves are produced in stages, and a
+        stage is only generated once the search has gone through the previous ones without a cutoff,
+        so no work is wasted on the moves that are never searched.
+
+        The board may be changed by the caller between two moves, as long as it is restored before
+        asking for the next one (as done by the make/unmake search).
+
+        Parameters:
+            board (Board): The current state of the game board.
+            depth (int): The remaining search depth, used to look up the killer moves.
+            tt_move (Tuple): The best move stored in the transposition table for the board, if any.
+
+        Yields:
+            Tuple: The legal moves (oi, oj, i, j), in the following stages:
+                1. **Transposition Table Move**: The best move found by an earlier search of the same board,
+                   yielded after a cheap legality check and before any move is generated.
+                2. **Capture Moves**: Moves where the opponent's piece is captured. Captures are mandatory,
+                   so when there are any they are the only legal moves and the non-capturing moves are never generated.
+                3. **Killer Moves**: Moves that have previously caused beta-cutoffs at the same depth, thus likely strong moves.
+                4. **History Heuristic Moves**: The remaining moves, sorted by how often they led to better outcomes in previous searches.
 
         Move Classification:
         - The method uses different heuristics from the `ORDENING` dictionary to classify and prioritize moves:
-            - **Killer Moves**: Stored in `self.killerMoves` for each depth. These moves caused a beta-cutoff earlier at the same depth and are sorted and evaluated first.
-            - **Capture Moves**: These moves involve capturing an opponent's piece, marked by `capture_available` in the new board state.
+            - **Killer Moves**: Stored in `self.killerMoves` for each depth, keyed by the board's Zobrist hash and the move. These moves caused a beta-cutoff earlier at the same depth and are sorted and evaluated first.
             - **History Heuristic Moves**: Moves that have a good history of success in previous searches, stored in `self.histHeuristic`.
-            - **Pruning Moves**: Moves that were pruned during earlier searches but are still legal and evaluated here.
-        """
-
-        boards = []
-        board.handle_capture()
-        turn = board.turn
-        killerMoves, pruningMoves, histHeuristic, captMoves = [], [], [], []
-
-        for i in range(9):
-            for j in range(9):
-                if board.board[i, j] == turn:
-                    for move in board.possible_moves[(i, j)]:
-                        if board.possible_moves[(i, j)][move]:
-                            newBoardObj = board.create_new_board(i, j, move[0], move[1])
-                            newBoardObj.zobrist = self.zobrist_hash(newBoardObj)
-
-                            if (
-                                ORDENING["killer_moves"]
-                                and board.depth in self.killerMoves
-                                and (board.zobrist, newBoardObj.zobrist)
-                                in self.killerMoves[board.depth]
-                            ):
-                                killerMoves.append(
-                                    (newBoardObj, i, j, move[0], move[1])
-                                )
-
-                            elif (
-                                ORDENING["history_heuristic"]
-                                and (i, j, move[0], move[1])
-                            ) in self.histHeuristic:
-                                histHeuristic.append(
-                                    (newBoardObj, i, j, move[0], move[1])
-                                )
-                            else:
-                                boards.append((newBoardObj, i, j, move[0], move[1]))
-        if ORDENING["killer_moves"]:
-            self.sort_killer_moves(killerMoves, board, self.killerMoves[board.depth])
+              Moves without history keep their generation order, after the ones with history.
+        """
 
-        if ORDENING["history_heuristic"]:
-            histHeuristic = self.sort_hist_moves(
-                histHeuristic, board, self.histHeuristic
-            )
+        # Stage 1: transposition table move
+        if tt_move is not None and board.is_legal(tt_move):
+            yield tt_move
+        else:
+            tt_move = None
+
+        # Stage 2: mandatory captures, falling back to the non-capturing moves when there are none
+        moves = board.capture_moves()
+        if not moves:
+            moves = board.quiet_moves()
+
+        # Stage 3: killer moves
+        killerMoves = []
+        if ORDENING["killer_moves"] and depth in self.killerMoves:
+            killers = self.killerMoves[depth]
+            zobrist = board.zobrist
+            killerMoves = [
+                move
+                for move in moves
+                if move != tt_move and (zobrist, move) in killers
+            ]
+            self.sort_killer_moves(killerMoves, board, killers)
+            yield from killerMoves
 
-        return killerMoves + captMoves + pruningMoves + histHeuristic + boards
+        # Stage 4: remaining moves, ordered by the history heuristic
+        remaining = [
+            move for move in moves if move != tt_move and move not in killerMoves
+        ]
+        if ORDENING["history_heuristic"]:
+            self.sort_hist_moves(remaining, board, self.histHeuristic)
+        yield from remaining
 
     def sort_killer_moves(self, move_list: list, board, move_dict: dict):
         move_list.sort(
-            key=lambda item: move_dict.get(
-                (board.zobrist, item[0].zobrist), float("-inf")
-            ),
+            key=lambda item: move_dict.get((board.zobrist, item), float("-inf")),
             reverse=True,
         )
         return move_list
@@ -408,9 +699,7 @@ class Engine:
     def sort_hist_moves(self, move_list: list, board, move_dict: dict):
 
         move_list.sort(
-            key=lambda item: move_dict.get(
-                (item[1], item[2], item[3], item[4]), float("-inf")
-            ),
+            key=lambda item: move_dict.get(item, float("-inf")),
             reverse=True,
         )
 
@@ -422,7 +711,7 @@ class Engine:
 
         Parameters:
             depth (int): The current depth of the search where the killer move was found.
-            move (Tuple): The move that resulted in a beta-cutoff, represented as a tuple containing board state information.
+            move (Tuple): The move that resulted in a beta-cutoff, represented as a (zobrist, move) tuple.
 
         Optimizations:
         - To maintain efficiency, the function stores only the top 10 most effective killer moves per depth.
@@ -465,92 +754,74 @@ class Engine:
 
     def zobrist_hash(self, board: Board):
         """
-        Computes the Zobrist hash for the given board state.
+        Computes the Zobrist hash for the given board state from scratch, including the side to move.
+        During the search the hash is maintained incrementally by `Board.move_pieces` and `Board.undo_move`.
 
         Parameters:
-            board (Board): The current board state, represented as a 2D array where each cell contains a piece or is empty.
+            board (Board): The current board state.
 
         Returns:
             int: The Zobrist hash value, a unique integer representing the current board configuration.
 
         """
 
-        zobrist_value = 0
-        for row in range(9):
-            for col in range(9):
-                if board.board[row, col] != 0:
-                    value = board.board[row, col]
-                    zobrist_value ^= self.zobrist_table[row, col, value]
+        return board.compute_zobrist()
+
+    def tt_key(self, board: Board):
+        """
+        Returns the key of the board in the transposition table.
+
+        With MIRROR_TT the rules are symmetric under left-right reflection, so a position and its
+        mirror image have the same score: both are stored under the smaller of their two Zobrist
+        hashes (`Board.zobrist` and `Board.zobrist_mirror`, both kept up to date incrementally),
+        with the best move of the orientation the key belongs to. The entries are therefore also
+        valid for a table used without MIRROR_TT, and the other way around.
 
-        return zobrist_value
+        Parameters:
+            board (Board): The current board state.
+
+        Returns:
+            tuple: The key, and whether it is the hash of the mirror image, in which case the
+                   best move stored in the entry must be mirrored (see `states.mirror_move`).
+        """
+        if MIRROR_TT and board.zobrist_mirror < board.zobrist:
+            return board.zobrist_mirror, True
+        return board.zobrist, False
 
     def hash_index(self, zobrist_value):
         """
-        Computes the index for the Zobrist hash value to access the transposition table.
+        Computes the index of the bucket of the transposition table for the Zobrist hash value.
 
         Parameters:
             zobrist_value (int): The Zobrist hash value of the current board state.
 
         Returns:
-            int: The index corresponding to the Zobrist hash in the transposition table, determined by taking the modulo
-                 of the Zobrist value with the size of the table.
+            int: The index of the bucket holding the Zobrist hash in the transposition table, determined by taking the modulo
+                 of the Zobrist value with the number of buckets.
         """
-        return zobrist_value % self.size
+        return zobrist_value % self.t_table.num_buckets
 
-    def insert(self, board: Board):
+    def insert(self, zobrist, score, flag, depth, best_move):
         """
-        Inserts the given board state into the transposition table (TT) based on its Zobrist hash,
+        Inserts the result of a search into the transposition table (TT) based on its Zobrist hash,
         storing key information about the board and the search results to optimize future lookups.
 
         Parameters:
-            board (Board): The board state to be inserted into the transposition table, containing information
-                           such as score, flag (for alpha-beta pruning), depth, bounds, and the best move.
+            zobrist (int): The Zobrist hash of the searched board.
+            score (int): The score found by the search.
+            flag (int): The bound type of the score (EXACT, LOWER_BOUND or UPPER_BOUND).
+            depth (int): The depth of the search.
+            best_move (Tuple): The best move found by the search.
 
         Collision Handling:
-        - If a collision occurs (i.e., two different board states hash to the same index), the function only overwrites
-          the existing entry if the new board has been searched at a greater depth, as deeper searches provide more
-          accurate evaluations.
+        - Every bucket holds `BUCKET_SIZE` entries. The first one is only overwritten by a search at least as deep or
+          when it comes from an older search, the others are always replaced, starting from the shallowest one.
+        - The Zobrist key is stored with the entry, so positions sharing a bucket never share an entry.
 
         """
 
-        index = self.hash_index(board.zobrist)
-        if self.t_table[index]["depth"] != 0:
+        if self.t_table.store(zobrist, score, flag, depth, best_move):
             self.collisions += 1
-            if self.t_table[index]["depth"] > board.depth:
-
-                self.t_table[index] = np.array(
-                    [
-                        (
-                            board.score,
-                            board.flag,
-                            board.upper_bound,
-                            board.lower_bound,
-                            board.depth,
-                            board.best_move,
-                        )
-                    ],
-                    dtype=self.t_table.dtype,
-                )
-
-                self.num_elements += 1
-
-                return
-
-        self.t_table[index] = np.array(
-            [
-                (
-                    board.score,
-                    board.flag,
-                    board.upper_bound,
-                    board.lower_bound,
-                    board.depth,
-                    board.best_move,
-                )
-            ],
-            dtype=self.t_table.dtype,
-        )
-
-        self.num_elements += 1
 
     def get(self, key):
         """
@@ -560,43 +831,27 @@ class Engine:
             key (int): The Zobrist hash key of the current board state.
 
         Returns:
-            dict: The entry from the transposition table at the computed index. If no valid entry exists
-                  (i.e., depth is -1), it returns a dictionary with {"depth": -1}, indicating an invalid entry.
+            tuple: The (score, flag, depth, best_move) entry stored for the key, or None if the
+                   position is not in the transposition table.
         """
 
-        index = self.hash_index(key)
-        entry = self.t_table[index]
-        if entry["depth"] == -1:
-            return {"depth": -1}
+        entry = self.t_table.probe(key)
+        self.tt_probes += 1
+        if entry is not None:
+            self.tt_hits += 1
         return entry
 
     def change_table(self):
         """
         Optimizes the transposition table (TT) by retaining only the most relevant entries, based on search depth.
-        The function clears old entries and resizes the TT, keeping only a percentage of the most useful entries.
-\
+        The function clears the shallowest entries, keeping only a percentage of the most useful entries.
+
         Purpose:
-        - This method reduces memory usage and improves lookup performance by retaining only the most important entries, 
-          which are those corresponding to deeper searches.
+        - Used when a table saved by a previous run is loaded: the deep entries are the expensive ones to
+          recompute, while the shallow ones would only take the slots of the new searches.
         """
-
-        new_table = np.zeros(self.size, dtype=self.t_table.dtype)
-        print("Optimizing table")
-        all_elements = []
-        for i in range(self.size):
-            entry = self.t_table[i]
-            if entry["depth"] != -1:
-                all_elements.append((entry))
-
-        largest_elements = heapq.nlargest(
-            int(self.size * self.percentage), all_elements, key=lambda x: x[1]["depth"]
-        )
-
-        for zobrist, entry in largest_elements:
-            new_index = self.hash_index(zobrist) % self.size
-            new_table[new_index] = entry
-
-        self.table = new_table
+        logger.info("Optimizing table")
+        self.num_elements = self.t_table.keep_deepest(self.percentage)
 
     def clear_table(self):
         """
@@ -606,10 +861,133 @@ class Engine:
         - This method is used to reset the transposition table, which can be useful when starting a new search or
           when optimizing the table after it becomes too large or filled with outdated data.
         """
-        self.t_table = np.zeros(self.size, dtype=self.t_table.dtype)
+        self.t_table.clear()
         self.num_elements = 0
 
-    def think(self, board: Board, depth, alpha, beta):
+    def principal_variation(self, board: Board, max_length: int = PV_LENGTH):
+        """
+        Extracts the principal variation, the sequence of best moves expected from both players,
+        by following the best moves stored in the transposition table from the board.
+
+        The variation stops at a position missing from the table, at an illegal move (the entry
+        of another position sharing the hash) or at a repeated position.
+
+        Parameters:
+            board (Board): The board the variation starts from, unchanged on return.
+            max_length (int): The maximum number of moves.
+
+        Returns:
+            List[Tuple]: The moves of the principal variation.
+        """
+        pv = []
+        seen = set()
+        while len(pv) < max_length and board.zobrist not in seen:
+            seen.add(board.zobrist)
+            key, mirrored = self.tt_key(board)
+            entry = self.t_table.probe(key)
+            if entry is None or entry[3] is None:
+                break
+            move = mirror_move(entry[3]) if mirrored else entry[3]
+            if not board.is_legal(move):
+                break
+            pv.append(move)
+            board.move_pieces(*move)
+        for _ in pv:
+            board.undo_move()
+        return pv
+
+    def search(self, board: Board, depth: int, alpha, beta):
+        """
+        Runs a single search of the board to the given depth with the method selected by the
+        enabled flags (TT, MULTICUT).
+
+        Returns:
+            tuple: The best score and the best move found.
+        """
+        if TT:
+            return self.alpha_beta_Negamax_TT(board, depth, alpha, beta)
+        elif MULTICUT:
+            return self.multi_cut(C, M, board, depth, alpha, beta)
+        return self.alpha_beta_Negamax(board, depth, alpha, beta)
+
+    def iterative_deepening(
+        self, board: Board, max_depth: int, alpha, beta, time_limit=None
+    ):
+        """
+        Searches the board at increasing depths until `max_depth` is completed or `time_limit` seconds
+        have passed. Every iteration stores its results in the transposition table, so the next one
+        searches the previous best moves first.
+
+        When the deadline passes (or `stop_event` is set) in the middle of an iteration, the search is aborted,
+        the moves it applied to the board are reverted, and the result of the last completed iteration is used.
+
+        Parameters:
+            board (Board): The current board state.
+            max_depth (int): The maximum search depth.
+            alpha (float): The alpha value for alpha-beta pruning.
+            beta (float): The beta value for alpha-beta pruning.
+            time_limit (float): The time budget in seconds, or None to search until `max_depth`.
+
+        Returns:
+            tuple: The best score, the best move and the depth of the last completed iteration.
+        """
+        if time_limit is not None:
+            self.deadline = time.time() + time_limit
+        ply = len(board.moves)
+        score, bestMove, reached = None, None, 0
+        try:
+            for d in range(1, max_depth + 1):
+                self.start_iteration(d)
+                score, bestMove = self.search(board, d, alpha, beta)
+                reached = d
+                self.end_iteration()
+                if self.progress is not None:
+                    pv = self.principal_variation(board) if TT else []
+                    self.progress(d, score, pv if pv[:1] == [bestMove] else [bestMove])
+        except SearchTimeout:
+            self.end_iteration(completed=False)
+            while len(board.moves) > ply:
+                board.undo_move()
+        finally:
+            self.deadline = None
+
+        if bestMove is None:
+            # Not even the first iteration completed: play the first ordered move
+            moves = self.next_moves(board, 1)
+            if moves:
+                bestMove = moves[0]
+        return score, bestMove, reached
+
+    def parallel_search(self, board: Board, depth: int, alpha, beta, time_limit=None):
+        """
+        Searches the board with the Lazy SMP worker processes, starting them on the first call.
+        From then on the engine's transposition table is the one shared with the workers
+        (with a table file, the workers map the same file as the engine).
+
+        Returns:
+            tuple: The best score, the best move, the depth reached and the nodes searched by all the workers.
+        """
+        if self.smp is None:
+            from smp import LazySMP
+
+            self.t_table.flush()
+            self.smp = LazySMP(self.workers, self.size, self.bucket_size, self.tt_file)
+            if self.tt_file is None:
+                self.t_table = TranspositionTable(
+                    self.size, self.bucket_size, self.smp.table
+                )
+        return self.smp.search(
+            board, depth, alpha, beta, time_limit, self.t_table.generation
+        )
+
+    def close(self):
+        """Stops the Lazy SMP worker processes, if they were started, and saves the table file, if any."""
+        if self.smp is not None:
+            self.smp.close()
+            self.smp = None
+        self.t_table.flush()
+
+    def think(self, board: Board, depth, alpha, beta, time_limit=None):
         """
         Executes the main search algorithm, selecting the optimal move from the given board state.
         This method supports various search optimizations such as Transposition Table (TT), Aspirational Search (AS),
@@ -620,38 +998,93 @@ class Engine:
             depth (int): The maximum search depth.
             alpha (float): The alpha value for alpha-beta pruning (initially set to -infinity).
             beta (float): The beta value for alpha-beta pruning (initially set to +infinity).
+            time_limit (float): Optional time budget in seconds. When given, the board is searched with
+                                `iterative_deepening` up to `depth`, instead of once at a fixed depth
+                                (aspirational search is not used in this mode). So is a search that can be
+                                cancelled through `stop_event`, which then plays the move of the last
+                                completed iteration.
+
+        With more than one worker (see SMP in parameters.py) the board is searched by `smp.LazySMP`
+        worker processes, which deepen iteratively and share the transposition table.
+
+        When both sides have few enough pieces to be covered by the endgame tables, the best move is
+        read from the tables instead (with depth 0), and inside the search such positions are not expanded.
+
+        Statistics of the search are reported through the logging module, and when enabled (see STATS
+        in parameters.py) collected per iteration in a `stats.SearchStats`, passed to `callback`.
 
         Returns:
-            Board: The updated board state after evaluating the best move.
+            Board: A copy of the board with the best move applied. Its `best_move`, `score` and `depth`
+                   hold the move played, its score and the depth reached by the search, `pv` the
+                   principal variation starting with the move played, and `stats` the statistics
+                   of the search (None when they are not collected).
         """
 
         # Start timer to measure search time
         start_time = time.time()
+        self.reset_counters()
+        self.stats = SearchStats() if self.collect_stats else None
 
         # Compute the Zobrist hash for the current board state
         board.zobrist = self.zobrist_hash(board)
-
-        # Select the search method based on enabled flags (TT, AS, MULTICUT)
-        if TT and AS:
-            score, bestBoard = self.aspirational_search(
+        board.zobrist_mirror = board.compute_zobrist(mirror=True)
+        self.t_table.new_search()
+
+        # Positions covered by the endgame tables are played without searching
+        tbScore, tbMove = None, None
+        if self.tablebase is not None:
+            tbScore, tbMove = self.tablebase.best_move(board)
+
+        # Searches at a single depth are recorded as one iteration, the others record their own
+        stoppable = time_limit is not None or self.stop_event is not None
+        iterative = tbMove is None and self.workers == 1 and (stoppable or AS)
+        if not iterative:
+            self.start_iteration(depth)
+
+        # Select the search method based on enabled flags (SMP, TT, AS, MULTICUT)
+        if tbMove is not None:
+            score, bestMove, depth = tbScore, tbMove, 0
+        elif self.workers > 1:
+            score, bestMove, depth, self.nodes = self.parallel_search(
+                board, depth, alpha, beta, time_limit
+            )
+        elif stoppable:
+            score, bestMove, depth = self.iterative_deepening(
+                board, depth, alpha, beta, time_limit
+            )
+        elif TT and AS:
+            score, bestMove = self.aspirational_search(
                 DELTA, MAX_DEPTH, board, depth, alpha, beta
             )
         elif TT:
-            score, bestBoard = self.alpha_beta_Negamax_TT(board, depth, alpha, beta)
+            score, bestMove = self.alpha_beta_Negamax_TT(board, depth, alpha, beta)
         elif MULTICUT:
-            score, bestBoard = self.multi_cut(C, M, board, depth, alpha, beta)
+            score, bestMove = self.multi_cut(C, M, board, depth, alpha, beta)
         elif AS:
-            score, bestBoard = self.aspirational_search(
+            score, bestMove = self.aspirational_search(
                 1200, 5, board, depth, alpha, beta
             )
         else:
-            score, bestBoard = self.alpha_beta_Negamax(board, depth, alpha, beta)
-
-        # Extract the best move found during the search
-        best_move = board.best_move
-
-        # Deep copy the best board state to ensure no references are shared
-        board = copy.deepcopy(bestBoard)
+            score, bestMove = self.alpha_beta_Negamax(board, depth, alpha, beta)
+
+        if not iterative:
+            self.end_iteration()
+
+        # Extract the best move found during the search, and the expected continuation
+        best_move = bestMove
+        pv = self.principal_variation(board) if TT else []
+        if best_move is not None and pv[:1] != [best_move]:
+            pv = [best_move]
+
+        # Apply the best move to a copy, so the caller's board is not shared with the engine
+        board = copy.deepcopy(board)
+        if best_move is not None:
+            board.move_pieces(*best_move)
+        board.best_move = best_move
+        board.score = score
+        board.depth = depth
+        board.stats = self.stats
+        board.pv = pv
 
         # Reset pruning moves dictionary and statistics
         self.pruningMoves = {}
@@ -659,22 +1092,33 @@ class Engine:
         # Calculate elapsed time
         elapsed_time = time.time() - start_time
 
-        # Improved and detailed print statements for performance metrics
-        print(f"Search completed in {elapsed_time:.4f} seconds")
-        print(f"Depth searched: {depth}")
-        print(f"Score of the best move: {score}")
-        print(f"Number of moves evaluated: {board.move_number}")
-        print(f"Number of prunings during search: {self.pruning_numbers}")
-        print(f"Best move: {best_move}")
+        # Number of positions stored in the transposition table
+        if TT or self.stats is not None:
+            self.num_elements = self.t_table.occupancy()
+
+        # Performance metrics, reported through the logging module
+        logger.info("Search completed in %.4f seconds", elapsed_time)
+        logger.info("Depth searched: %s", depth)
+        logger.info("Score of the best move: %s", score)
+        logger.info("Number of moves evaluated: %s", board.move_number)
+        logger.info("Number of prunings during search: %s", self.pruning_numbers)
+        logger.info("Best move: %s", best_move)
+        logger.info("Principal variation: %s", pv)
         if TT:
-            print(f"Number of transposition table elements: {self.num_elements}")
-            print(f"Number of transposition table collisions: {self.collisions}")
-        print("-" * 50)
+            logger.info("Number of transposition table elements: %s", self.num_elements)
+            logger.info("Number of transposition table collisions: %s", self.collisions)
+        if self.stats is not None:
+            self.stats.finish(self, depth, score, best_move, pv)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(self.stats.summary())
+            if self.callback is not None:
+                self.callback(self.stats)
+        logger.info("-" * 50)
 
         # Reset collision and pruning statistics for the next search
         self.collisions = 0
         self.pruning_numbers = 0
-        if RESET_TABLE:
+        if self.reset_table:
             self.clear_table()
             self.num_elements = 0
 
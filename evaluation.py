@@ -0,0 +1,115 @@
+"""
+Vectorized evaluation of many positions at once.
+
+Positions are stacked in an (N, 9, 9) array with the same encoding as `Board.board`
+(0 for empty squares, 1 and 2 for the two colours), and every term of
+`Board.utility_function` is computed with NumPy operations over the whole stack.
+The scores are exactly the ones of `Board.utility_function`.
+"""
+
+from typing import List
+import numpy as np
+from bitboard import NUM_SQUARES
+from states import Board, PIECE_SQUARE_VALUES, VULNERABILITY_PENALTY
+
+# Piece-square values as (team, colour, row, column) arrays, with zeros for the empty squares
+_VALUES = {
+    team: np.array(PIECE_SQUARE_VALUES[team], dtype=np.int64).reshape(3, 9, 9)
+    for team in (1, 2)
+}
+_ROWS = np.arange(9)[:, None]
+_COLS = np.arange(9)[None, :]
+
+
+def stack_boards(boards: List[Board]) -> np.ndarray:
+    """
+    Stacks the positions of several boards into an (N, 9, 9) array.
+
+    The bitboards of all the boards are converted together with a single `np.unpackbits`.
+
+    Parameters:
+        boards (List[Board]): The boards to stack.
+
+    Returns:
+        np.ndarray: An (N, 9, 9) int8 array of the positions.
+    """
+    size = (NUM_SQUARES + 7) // 8
+    data = b"".join(
+        board.pieces[colour].to_bytes(size, "little")
+        for board in boards
+        for colour in (1, 2)
+    )
+    bits = np.unpackbits(
+        np.frombuffer(data, dtype=np.uint8).reshape(len(boards), 2, size),
+        axis=2,
+        bitorder="little",
+    )[:, :, :NUM_SQUARES]
+    positions = bits[:, 0] + 2 * bits[:, 1]
+    return positions.astype(np.int8).reshape(len(boards), 9, 9)
+
+
+def child_positions(board: Board):
+    """
+    Stacks the positions reached by every legal move of the board, for example to evaluate
+    all the children of a frontier node at once. The board is unchanged on return.
+
+    Parameters:
+        board (Board): The board whose children are generated.
+
+    Returns:
+        tuple: The list of legal moves and the (N, 9, 9) array of the resulting positions.
+    """
+    moves = board.legal_moves()
+    children = []
+    for move in moves:
+        board.move_pieces(*move)
+        child = Board(team=board.team, turn=board.turn)
+        child.pieces = list(board.pieces)
+        children.append(child)
+        board.undo_move()
+    if not children:
+        return moves, np.zeros((0, 9, 9), dtype=np.int8)
+    return moves, stack_boards(children)
+
+
+def utility_batch(positions: np.ndarray, team: int, chunk_size: int = 65536) -> np.ndarray:
+    """
+    Evaluates a stack of positions with the same terms and weights as `Board.utility_function`.
+
+    Parameters:
+        positions (np.ndarray): An (N, 9, 9) array of positions, or a single (9, 9) position.
+        team (int): The colour that advances towards row 0, from whose point of view the positions are scored.
+        chunk_size (int): Number of positions evaluated at a time, to bound the temporary arrays
+                          when scoring millions of positions.
+
+    Returns:
+        np.ndarray: The (N,) int64 array of utilities.
+    """
+    positions = np.asarray(positions)
+    if positions.ndim == 2:
+        positions = positions[None]
+    values = _VALUES[team]
+    utilities = np.empty(len(positions), dtype=np.int64)
+
+    for start in range(0, len(positions), chunk_size):
+        chunk = positions[start : start + chunk_size]
+
+        # Material, position and promotion terms
+        piece_score = values[chunk, _ROWS, _COLS].sum(axis=(1, 2))
+
+        # Pieces with an opponent diagonally in front and an empty square diagonally behind
+        own = chunk[:, 1:8, 1:8] == team
+        opponent = chunk == 3 - team
+        empty = chunk == 0
+        captures = np.count_nonzero(
+            own & opponent[:, 0:7, 2:9] & empty[:, 2:9, 0:7], axis=(1, 2)
+        )
+        captures += np.count_nonzero(
+            own & opponent[:, 0:7, 0:7] & empty[:, 2:9, 2:9], axis=(1, 2)
+        )
+
+        utilities[start : start + len(chunk)] = (
+            piece_score - captures * VULNERABILITY_PENALTY
+        )
+
+    return utilities
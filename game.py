@@ -1,7 +1,10 @@
+import logging
 import pygame
 from pygame.locals import *
-from states import Board, PygameEnviroment
+from states import Board
+from display import PygameEnviroment
 from engine import Engine
+from worker import EngineWorker
 from parameters import *
 
 
@@ -11,7 +14,12 @@ screen = pygame.display.set_mode(GAME_RES, pygame.HWSURFACE | pygame.DOUBLEBUF)
 board_obj = Board(turn=TURN, team=TEAM)
 env = PygameEnviroment(board_obj)
 env.board_obj.create_boards()
-engine = Engine(size=SIZE, reset_table=RESET_TABLE, p=PERCENTAGE)
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+engine = Engine(size=SIZE, reset_table=RESET_TABLE, p=PERCENTAGE, tt_file=TT_FILE)
+# The engine searches in a background thread, so the window keeps responding while it thinks
+worker = EngineWorker(engine)
+searching = None
+clock = pygame.time.Clock()
 current_selection = None
 running = True
 click_time = 0
@@ -20,6 +28,28 @@ while running:
     screen.fill(SCREEN_COLOUR)
     env.show(screen, GAME_RES, GRID_SIZE, CELL_SIZE, COLOR)
     pygame.display.flip()
+    clock.tick(FPS)
+
+    # Progress and result of the search, ignoring the ones of abandoned searches
+    for kind, request, data in worker.poll():
+        if request != searching:
+            continue
+        if kind == "progress":
+            depth, score, pv = data
+            pygame.display.set_caption(
+                f"{GAME_TITLE} - thinking: depth {depth}, score {score}, pv {pv}"
+            )
+        elif kind == "error":
+            # The search failed: the position is unchanged, and can be searched again
+            searching = None
+            pygame.display.set_caption(f"{GAME_TITLE} - search failed: {data}")
+        else:
+            env.board_obj = data
+            searching = None
+            pygame.display.set_caption(GAME_TITLE)
+            # Think on the opponent's time about the reply it is expected to play
+            if PONDER and not data.winner():
+                worker.ponder(data, DEPTH)
 
     for event in pygame.event.get():
 
@@ -27,6 +57,12 @@ while running:
             running = False
 
         if event.type == pygame.KEYDOWN:
+            if event.key in (pygame.K_k, pygame.K_r):
+                # abandon the search or the pondering of the position being changed
+                worker.cancel()
+                searching = None
+                pygame.display.set_caption(GAME_TITLE)
+
             if event.key == pygame.K_k:
                 # undo move
                 env.board_obj.undo_move()
@@ -41,9 +77,13 @@ while running:
                 print("Automatic Player")
                 if PLAYERS[env.board_obj.turn - 1] == "automatic":
 
-                    if env.board_obj.turn == env.board_obj.team:
+                    if env.board_obj.turn == env.board_obj.team and searching is None:
                         print("Thinking...")
-                        env.board_obj = engine.think(env.board_obj, DEPTH, MIN, MAX)
+                        searching = worker.search(env.board_obj, DEPTH, TIME_LIMIT)
+
+            if event.key == pygame.K_c and searching is not None:
+                # stop thinking and play the best move found so far
+                worker.cancel()
 
             if event.key == K_UP:
 
@@ -59,7 +99,7 @@ while running:
             if PLAYERS[env.board_obj.turn - 1] == "manually":
                 env.board_obj.handle_capture()
 
-            if event.type == MOUSEBUTTONDOWN:
+            if event.type == MOUSEBUTTONDOWN and searching is None:
                 # Manual Move
                 pos = pygame.mouse.get_pos()
                 x, y = pos
@@ -96,4 +136,5 @@ while running:
                         env.selected_piece = [y, x]
 
 
+worker.close()
 pygame.quit()
@@ -4,6 +4,7 @@ GAME_TITLE, SCREEN_COLOUR = "Fianco", (255, 255, 255)
 GAME_RES = WIDTH, HEIGHT = 900, 720
 GRID_SIZE = 720
 CELL_SIZE = GRID_SIZE // 9
+FPS = 30  # frames drawn per second, leaving the rest of the time to the engine
 
 # GAME SETTINGS
 TEAM = 1
@@ -17,12 +18,25 @@ MIN = -3200000
 MAX = 3200000
 DEPTH_EXTENSION = False
 RESET_TABLE = False
+PVS = True  # search all but the first move with a null window (needs TT)
+PV_LENGTH = 20  # maximum length of the principal variation extracted from the table
+
+# QUIESCENCE SEARCH
+QUIESCENCE = True  # search the forced captures at the horizon before evaluating
+QS_DELTA = 1000  # delta pruning margin, above the value of any capture
 
 ORDENING = {
     "killer_moves": True,
     "history_heuristic": True,
 }
 
+# TIME CONTROL
+TIME_LIMIT = None  # seconds per move; when set, the engine deepens iteratively up to DEPTH
+PONDER = True  # search the expected reply while the opponent thinks (see worker.py)
+
+# SEARCH STATISTICS
+STATS = False  # collect nodes, cutoffs and table hits per iteration (see stats.py)
+
 # ASPIRATIONAL SEARCH
 AS = False
 DELTA = 1200
@@ -34,9 +48,31 @@ R = 2
 C = 2
 M = 3
 
+# LATE MOVE REDUCTIONS, FUTILITY PRUNING AND RAZORING (quiet moves only, need TT and PVS)
+LMR = True
+LMR_DEPTH = 3  # minimum remaining depth at which late moves are reduced
+LMR_MOVES = 3  # moves searched at full depth before the reductions start
+LMR_REDUCTION = 1  # plies taken off a late quiet move
+FUTILITY = True
+FUTILITY_MARGINS = (0, 500, 1200)  # by remaining depth (1-2): most a quiet move can gain
+RAZORING = True
+RAZOR_MARGINS = (0, 800, 1600)  # by remaining depth (1-2): below alpha by this, try quiescence
+
+# ENDGAME TABLEBASES
+TABLEBASE_DIR = "tablebases"  # generated with `python tablebase.py`, probed when found
+TABLEBASE_PIECES = 2  # pieces per side covered by the generated tables
+
+# LAZY SMP
+SMP = False
+WORKERS = 4  # processes searching in parallel, sharing the transposition table
+
 # TRASPOSITIONAL TABLE
 TT = True
 SIZE = int(math.pow(2, 20))
+BUCKET_SIZE = 4
 IMP_MOVES_SIZE = 4000
-PERCENTAGE = 0.75
+PERCENTAGE = 0.75  # fraction of the deepest entries kept when a table file is reloaded
 RESET_TABLE = False
+TT_FILE = None  # path of a memory-mapped file keeping the table across engine restarts
+MIRROR_TT = False  # store a position and its left-right mirror image in the same entry
+ZOBRIST_SEED = 20241
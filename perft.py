@@ -0,0 +1,189 @@
+"""
+Perft: counts the positions reached by every sequence of legal moves up to a given depth.
+
+Perft measures the speed of move generation and checks its correctness: the counts of a set
+of fixed positions are known, and any change to the move generation must reproduce them.
+The mandatory capture rule is applied, and the game ends (no more moves are counted) when a
+piece reaches its last row.
+
+Two move generators can be counted: "bitboard", the one used by the engine (`Board.legal_moves`),
+and "board", the one used by the manual player (`Board.handle_capture` and `Board.possible_moves`).
+
+    python perft.py --depth 5                 # count the initial position
+    python perft.py --depth 4 --divide        # counts per root move
+    python perft.py --check                   # compare with the reference counts
+"""
+
+import argparse
+import time
+from bitboard import ROWS
+from states import Board
+
+# Reference counts of fixed positions, by depth
+PERFT_POSITIONS = [
+    (
+        "initial",
+        "bbbbbbbbb/1b5b1/2b3b2/3b1b3/9/3w1w3/2w3w2/1w5w1/wwwwwwwww w",
+        {1: 25, 2: 623, 3: 14975, 4: 356399, 5: 8419237},
+    ),
+    (
+        "opening",
+        "b1bb1bbbb/1bbb3b1/2b4b1/3b1b3/9/3w1w3/1w1w2w2/1w6w/1wwwwwwww w",
+        {1: 25, 2: 648, 3: 16301, 4: 410019},
+    ),
+    (
+        "middlegame",
+        "bb1bbbbbb/1bb6/2b6/6bb1/9/2ww5/9/ww3w1w1/1wwww1www w",
+        {1: 21, 2: 399, 3: 8584, 4: 175700},
+    ),
+    (
+        "captures",
+        "bbb1bbbbb/1bb4b1/2b2b3/5b3/4b4/4www2/2w4w1/1w2ww3/wwww2www w",
+        {1: 1, 2: 1, 3: 26, 4: 487},
+    ),
+    (
+        "endgame",
+        "9/1w7/9/4b4/3w5/9/9/7b1/9 b",
+        {1: 1, 2: 3, 3: 12, 4: 25, 5: 87, 6: 216},
+    ),
+]
+
+
+def board_moves(board: Board):
+    """Generates the legal moves with `handle_capture`, as done for the manual player."""
+    board.handle_capture()
+    return [
+        (oi, oj, i, j)
+        for (oi, oj), targets in board.possible_moves.items()
+        for (i, j), legal in targets.items()
+        if legal
+    ]
+
+
+def bitboard_moves(board: Board):
+    """Generates the legal moves with the bitboards, as done by the engine."""
+    return board.legal_moves()
+
+
+GENERATORS = {"bitboard": bitboard_moves, "board": board_moves}
+
+
+def game_over(board: Board) -> bool:
+    """Checks whether a piece has reached its last row."""
+    team = board.team
+    return bool(board.pieces[team] & ROWS[0] or board.pieces[3 - team] & ROWS[8])
+
+
+def perft(board: Board, depth: int, generate=bitboard_moves, cache: dict = None) -> int:
+    """
+    Counts the positions reached from the board by every sequence of `depth` legal moves.
+
+    Parameters:
+        board (Board): The starting position, unchanged on return.
+        depth (int): The number of moves.
+        generate (Callable): The move generator.
+        cache (dict): Optional dictionary of the counts already computed, keyed by Zobrist hash and depth,
+                      so that transpositions are only counted once. A position and its mirror image
+                      have the same counts, and share the smaller of their two hashes.
+
+    Returns:
+        int: The number of positions.
+    """
+    if depth == 0:
+        return 1
+    if game_over(board):
+        return 0
+    if cache is not None:
+        key = (min(board.zobrist, board.zobrist_mirror), depth)
+        if key in cache:
+            return cache[key]
+
+    moves = generate(board)
+    if depth == 1:
+        nodes = len(moves)
+    else:
+        nodes = 0
+        for move in moves:
+            board.move_pieces(*move)
+            nodes += perft(board, depth - 1, generate, cache)
+            board.undo_move()
+
+    if cache is not None:
+        cache[key] = nodes
+    return nodes
+
+
+def divide(board: Board, depth: int, generate=bitboard_moves, cache: dict = None) -> dict:
+    """
+    Counts the positions reached by every legal move of the board, to locate a wrong count.
+
+    Returns:
+        dict: The number of positions reached by every move, after `depth - 1` more moves.
+    """
+    counts = {}
+    for move in generate(board):
+        board.move_pieces(*move)
+        counts[move] = perft(board, depth - 1, generate, cache)
+        board.undo_move()
+    return counts
+
+
+def run(board: Board, depth: int, generator: str, hashed: bool, split: bool) -> int:
+    """Counts the positions of a board, printing the counts per move when `split` and the speed."""
+    generate = GENERATORS[generator]
+    cache = {} if hashed else None
+    start_time = time.time()
+    if split:
+        counts = divide(board, depth, generate, cache)
+        for move, count in counts.items():
+            print(f"{move}: {count}")
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(board, depth, generate, cache)
+    elapsed_time = time.time() - start_time
+    print(
+        f"depth: {depth}  nodes: {nodes}  time: {elapsed_time:.3f}s  "
+        f"nodes/s: {nodes / max(elapsed_time, 1e-9):.0f}"
+    )
+    return nodes
+
+
+def check(generator: str, max_depth: int) -> bool:
+    """
+    Compares the counts of the reference positions up to `max_depth` with `PERFT_POSITIONS`.
+
+    Returns:
+        bool: True if every count matches.
+    """
+    generate = GENERATORS[generator]
+    passed = True
+    for name, position, counts in PERFT_POSITIONS:
+        board = Board.from_string(position)
+        for depth, expected in sorted(counts.items()):
+            if depth > max_depth:
+                continue
+            start_time = time.time()
+            nodes = perft(board, depth, generate)
+            elapsed_time = time.time() - start_time
+            status = "ok" if nodes == expected else f"FAILED (expected {expected})"
+            print(
+                f"{name} depth {depth}: {nodes} in {elapsed_time:.3f}s "
+                f"({nodes / max(elapsed_time, 1e-9):.0f} nodes/s) {status}"
+            )
+            passed = passed and nodes == expected
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fianco move generation perft")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--position", default=PERFT_POSITIONS[0][1])
+    parser.add_argument("--generator", choices=sorted(GENERATORS), default="bitboard")
+    parser.add_argument("--divide", action="store_true", help="print the counts per root move")
+    parser.add_argument("--hash", action="store_true", help="cache the counts of transpositions")
+    parser.add_argument("--check", action="store_true", help="compare with the reference counts")
+    args = parser.parse_args()
+
+    if args.check:
+        raise SystemExit(0 if check(args.generator, args.depth) else 1)
+    run(Board.from_string(args.position), args.depth, args.generator, args.hash, args.divide)
@@ -0,0 +1,266 @@
+"""
+Text protocol engine server, to drive the engine from a referee or a tournament harness.
+
+The engine runs as a long-lived process reading one command per line on stdin (or on a local
+TCP connection with --port) and answering on stdout. The engine and its transposition table,
+killer moves and history are kept from one move to the next, and the searches run in an
+`EngineWorker`, so that `stop` is handled while the engine thinks.
+
+Moves are written as the four digits of (oi, oj, i, j), e.g. 5343 for (5, 3) -> (4, 3), and
+positions in the text notation of `Board.to_string`.
+
+    position startpos [moves <move> ...]     set the position, then apply the moves
+    position <rows> <turn> [moves <move> ...]
+    moves <move> ...                         apply moves to the current position
+    go [depth <n>] [time <seconds>] [infinite]
+    stop                                     play the best move found so far
+    newgame                                  initial position and empty tables
+    isready                                  answered with "readyok"
+    show                                     print the current position
+    quit
+
+A search answers with "info depth <n> score <s> pv <move> ..." after every completed iteration,
+then "bestmove <move>" ("bestmove none" when there are no legal moves, or after
+"info string error <message>" when the search failed). Wrong commands are answered with
+"error <reason>".
+
+    python protocol.py
+    python protocol.py --port 5000
+"""
+
+import argparse
+import copy
+import logging
+import socket
+import sys
+import threading
+from parameters import DEPTH, TIME_LIMIT, SIZE, PERCENTAGE, TT_FILE
+from states import Board
+
+# Initial position, in the notation of `Board.to_string`
+START_POSITION = "bbbbbbbbb/1b5b1/2b3b2/3b1b3/9/3w1w3/2w3w2/1w5w1/wwwwwwwww w"
+# Maximum depth of a search limited by time or `stop` only
+GO_MAX_DEPTH = 64
+
+
+class ProtocolError(Exception):
+    """Raised for a command that cannot be executed, answered with an error line."""
+
+
+def parse_move(text: str):
+    """Parses a move written as four digits, e.g. "5343" for (5, 3, 4, 3)."""
+    if len(text) != 4 or not text.isdigit() or "9" in text:
+        raise ProtocolError(f"invalid move {text}")
+    return tuple(int(digit) for digit in text)
+
+
+def format_move(move) -> str:
+    """Writes a move as four digits."""
+    return "".join(str(coordinate) for coordinate in move)
+
+
+class EngineServer:
+    """
+    Executes the commands of the protocol, writing the answers to an output stream.
+    """
+
+    def __init__(self, output, size: int = SIZE) -> None:
+        """
+        Parameters:
+            output (TextIO): The stream the answers are written to.
+            size (int): Size of the transposition table.
+        """
+        from engine import Engine
+        from worker import EngineWorker
+
+        self.output = output
+        self.write_lock = threading.Lock()
+        self.board = Board.from_string(START_POSITION)
+        self.worker = EngineWorker(Engine(size=size, p=PERCENTAGE, tt_file=TT_FILE))
+        # Set while no search is running
+        self.idle = threading.Event()
+        self.idle.set()
+        self.answers = threading.Thread(target=self._answer, daemon=True)
+        self.answers.start()
+
+    def send(self, line: str) -> None:
+        """Writes a line of answer."""
+        with self.write_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def execute(self, line: str) -> bool:
+        """
+        Executes a command line.
+
+        Returns:
+            bool: False when the command is `quit`.
+        """
+        words = line.split()
+        if not words:
+            return True
+        command, arguments = words[0], words[1:]
+        if command == "quit":
+            return False
+        handler = getattr(self, f"command_{command}", None)
+        try:
+            if handler is None:
+                raise ProtocolError(f"unknown command {command}")
+            handler(arguments)
+        except ProtocolError as error:
+            self.send(f"error {error}")
+        return True
+
+    def command_position(self, arguments) -> None:
+        """Sets the position: "startpos" or the rows and the player to move, then optional moves."""
+        if "moves" in arguments:
+            split = arguments.index("moves")
+            arguments, moves = arguments[:split], arguments[split + 1 :]
+        else:
+            moves = []
+        if arguments == ["startpos"]:
+            text = START_POSITION
+        elif len(arguments) == 2:
+            text = " ".join(arguments)
+        else:
+            raise ProtocolError("position needs startpos or <rows> <turn>")
+        try:
+            board = Board.from_string(text)
+        except ValueError as error:
+            raise ProtocolError(error)
+        self.apply_moves(board, moves)
+        self.wait()
+        self.board = board
+
+    def command_moves(self, arguments) -> None:
+        """Applies moves to the current position."""
+        self.wait()
+        board = copy.deepcopy(self.board)
+        self.apply_moves(board, arguments)
+        self.board = board
+
+    def apply_moves(self, board: Board, moves) -> None:
+        """Applies moves to a board, checking that every one is legal."""
+        for text in moves:
+            move = parse_move(text)
+            if board.winner() or move not in board.legal_moves():
+                raise ProtocolError(f"illegal move {text}")
+            board.move_pieces(*move)
+
+    def command_go(self, arguments) -> None:
+        """
+        Searches the current position, whatever the order of the options: to the given depth,
+        within the given time, or both. Without options the search uses DEPTH and TIME_LIMIT; with
+        a time only it goes as deep as GO_MAX_DEPTH, with a depth only it has no time limit, and
+        `infinite` searches until `stop`.
+        """
+        depth, time_limit, infinite = None, None, False
+        options = iter(arguments)
+        try:
+            for option in options:
+                if option == "depth":
+                    depth = int(next(options))
+                elif option == "time":
+                    time_limit = float(next(options))
+                elif option == "infinite":
+                    infinite = True
+                else:
+                    raise ProtocolError(f"unknown go option {option}")
+        except (StopIteration, ValueError):
+            raise ProtocolError("go options need a number")
+        if infinite:
+            depth, time_limit = GO_MAX_DEPTH, None
+        elif depth is None and time_limit is None:
+            depth, time_limit = DEPTH, TIME_LIMIT
+        elif depth is None:
+            depth = GO_MAX_DEPTH
+        if not self.idle.is_set():
+            raise ProtocolError("already searching")
+        self.idle.clear()
+        self.worker.search(self.board, depth, time_limit)
+
+    def command_stop(self, arguments) -> None:
+        """Stops the search, which answers with the best move found so far."""
+        if not self.idle.is_set():
+            self.worker.cancel()
+
+    def command_newgame(self, arguments) -> None:
+        """Sets the initial position and empties the tables of the engine."""
+        self.wait()
+        engine = self.worker.engine
+        engine.clear_table()
+        engine.killerMoves.clear()
+        engine.histHeuristic.clear()
+        self.board = Board.from_string(START_POSITION)
+
+    def command_isready(self, arguments) -> None:
+        """Answers that the server is reading commands, even while it searches."""
+        self.send("readyok")
+
+    def command_show(self, arguments) -> None:
+        """Prints the current position."""
+        self.send(f"position {self.board.to_string()}")
+
+    def wait(self) -> None:
+        """Stops the current search, if any, and waits for its answer."""
+        if not self.idle.is_set():
+            self.worker.cancel()
+            self.idle.wait()
+
+    def close(self) -> None:
+        """Stops the search and the engine."""
+        self.wait()
+        self.worker.close()
+
+    def _answer(self) -> None:
+        """
+        Writes the progress and the result of the searches, as the worker sends them. Only one
+        search runs at a time, and a search is always waited for, so every answer is current.
+        A failed search is answered with "info string error <message>" and "bestmove none".
+        """
+        while True:
+            kind, _, data = self.worker.responses.get()
+            if kind == "progress":
+                depth, score, pv = data
+                self.send(
+                    f"info depth {depth} score {score} pv "
+                    + " ".join(format_move(move) for move in pv)
+                )
+                continue
+            try:
+                if kind == "error":
+                    self.send(f"info string error {data}")
+                    move = None
+                else:
+                    move = data.best_move
+                self.send(f"bestmove {format_move(move) if move is not None else 'none'}")
+            finally:
+                self.idle.set()
+
+
+def serve(input, output, size: int = SIZE) -> None:
+    """Executes the commands read from `input` until `quit` or the end of the input."""
+    server = EngineServer(output, size)
+    try:
+        for line in input:
+            if not server.execute(line):
+                break
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fianco engine protocol server")
+    parser.add_argument("--port", type=int, help="serve one connection on this local port instead of stdin")
+    parser.add_argument("--size", type=int, default=SIZE, help="transposition table entries")
+    parser.add_argument("--log-level", default="WARNING", help="level of the engine logs, written to stderr")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format="%(message)s", stream=sys.stderr)
+    if args.port is None:
+        serve(sys.stdin, sys.stdout, args.size)
+    else:
+        with socket.create_server(("127.0.0.1", args.port)) as listener:
+            connection, _ = listener.accept()
+            with connection, connection.makefile("r") as input, connection.makefile("w") as output:
+                serve(input, output, args.size)
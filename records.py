@@ -0,0 +1,210 @@
+"""
+Compact binary records of positions and games.
+
+A position is encoded in POSITION_BYTES (21) bytes: 2 bits per square, square s = i * 9 + j at
+bits 2s and 2s + 1 (0 for an empty square, else the colour of its piece), then the player to
+move at bit 162 (0 for colour 1, 1 for colour 2), little-endian. A move is encoded in two bytes,
+its origin and target squares.
+
+Two kinds of files, both starting with an 8-byte magic number:
+
+- Position files: the encoded positions one after the other. `load_positions` maps a whole
+  file into an (N, 21) array without copying it, and `decode_positions` unpacks such an array
+  into (N, 9, 9) boards and the (N,) players to move with a few vectorised operations.
+- Game logs, append-only: every game is its encoded start position, its number of moves
+  (2 bytes) and its encoded moves. `read_games` replays them.
+
+Moves and squares are also written with the a1-i9 coordinates drawn by `PygameEnviroment.show`,
+e.g. "d4-d5", whose row numbers depend on the colour shown at the bottom (COLOR) and on TEAM.
+"""
+
+import copy
+import numpy as np
+from bitboard import NUM_SQUARES, SQUARES, iter_bits
+from parameters import COLOR, TEAM
+from states import Board
+
+POSITION_BYTES = 21
+MOVE_BYTES = 2
+COUNT_BYTES = 2
+TURN_BIT = 2 * NUM_SQUARES
+POSITIONS_MAGIC = b"FINCOPOS"
+GAMES_MAGIC = b"FINCOGAM"
+MAGIC_BYTES = 8
+
+# Column letters of the coordinates, from column 0
+COLUMN_LABELS = "abcdefghi"
+
+
+def row_labels(colour: int = COLOR, team: int = TEAM) -> str:
+    """
+    Returns the numbers of the rows from row 0, as drawn by `PygameEnviroment.show` for the
+    colour `colour` of the display and the team moving up the board.
+    """
+    return "987654321" if (colour == 1) == (team == 1) else "123456789"
+
+
+def square_name(i: int, j: int, colour: int = COLOR, team: int = TEAM) -> str:
+    """Returns the coordinates of a square, e.g. "e5"."""
+    return COLUMN_LABELS[j] + row_labels(colour, team)[i]
+
+
+def parse_square(name: str, colour: int = COLOR, team: int = TEAM):
+    """Returns the (i, j) square of coordinates written with `square_name`."""
+    if len(name) != 2 or name[0] not in COLUMN_LABELS or name[1] not in "123456789":
+        raise ValueError(f"invalid square {name}")
+    return row_labels(colour, team).index(name[1]), COLUMN_LABELS.index(name[0])
+
+
+def move_name(move, colour: int = COLOR, team: int = TEAM) -> str:
+    """Returns the coordinates of the origin and the target of a move, e.g. "e4-e5"."""
+    oi, oj, i, j = move
+    return f"{square_name(oi, oj, colour, team)}-{square_name(i, j, colour, team)}"
+
+
+def parse_move_name(text: str, colour: int = COLOR, team: int = TEAM):
+    """Returns the (oi, oj, i, j) move written with `move_name`."""
+    origin, _, target = text.partition("-")
+    return parse_square(origin, colour, team) + parse_square(target, colour, team)
+
+
+def encode_position(board: Board) -> bytes:
+    """Encodes the pieces and the player to move of a board in POSITION_BYTES bytes."""
+    code = (board.turn - 1) << TURN_BIT
+    for colour in (1, 2):
+        for s in iter_bits(board.pieces[colour]):
+            code |= colour << (2 * s)
+    return code.to_bytes(POSITION_BYTES, "little")
+
+
+def decode_position(data: bytes, team: int = 1) -> Board:
+    """
+    Decodes a position encoded with `encode_position`.
+
+    Parameters:
+        data (bytes): The encoded position.
+        team (int): The colour that moves up the board.
+
+    Returns:
+        Board: The board, with its Zobrist hashes and piece score computed.
+    """
+    code = int.from_bytes(bytes(data), "little")
+    board = Board(team=team, turn=(code >> TURN_BIT & 1) + 1)
+    for s in range(NUM_SQUARES):
+        colour = code >> (2 * s) & 3
+        if colour:
+            board.pieces[colour] |= 1 << s
+    board.zobrist = board.compute_zobrist()
+    board.zobrist_mirror = board.compute_zobrist(mirror=True)
+    board.piece_score = board.compute_piece_score()
+    return board
+
+
+def encode_move(move) -> bytes:
+    """Encodes a move (oi, oj, i, j) as its origin and target squares."""
+    oi, oj, i, j = move
+    return bytes((oi * 9 + oj, i * 9 + j))
+
+
+def decode_move(data: bytes):
+    """Decodes a move encoded with `encode_move`."""
+    return SQUARES[data[0]] + SQUARES[data[1]]
+
+
+def _open_log(path: str, magic: bytes):
+    """Opens a file for appending, writing the magic number when it is new."""
+    f = open(path, "ab")
+    if f.tell() == 0:
+        f.write(magic)
+    return f
+
+
+def _check_magic(data, magic: bytes, path: str) -> None:
+    """Raises ValueError when the file does not start with the magic number."""
+    if bytes(data[:MAGIC_BYTES]) != magic:
+        raise ValueError(f"{path} is not a {magic.decode()} file")
+
+
+def write_positions(path: str, boards) -> int:
+    """
+    Appends positions to a position file, creating it if needed.
+
+    Returns:
+        int: The number of positions written.
+    """
+    count = 0
+    with _open_log(path, POSITIONS_MAGIC) as f:
+        for board in boards:
+            f.write(encode_position(board))
+            count += 1
+    return count
+
+
+def load_positions(path: str) -> np.ndarray:
+    """
+    Maps a position file into memory, without reading it.
+
+    Returns:
+        np.ndarray: Read-only (N, POSITION_BYTES) uint8 array of the encoded positions.
+    """
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    _check_magic(data, POSITIONS_MAGIC, path)
+    count = (len(data) - MAGIC_BYTES) // POSITION_BYTES
+    return data[MAGIC_BYTES : MAGIC_BYTES + count * POSITION_BYTES].reshape(
+        count, POSITION_BYTES
+    )
+
+
+def decode_positions(positions: np.ndarray):
+    """
+    Unpacks encoded positions, e.g. a slice of `load_positions`.
+
+    Parameters:
+        positions (np.ndarray): (N, POSITION_BYTES) uint8 array of encoded positions.
+
+    Returns:
+        tuple: (N, 9, 9) uint8 array of the colour on every square (0 when empty), as `Board.board`,
+               and (N,) uint8 array of the player to move.
+    """
+    bits = np.unpackbits(positions, axis=1, bitorder="little")
+    squares = bits[:, 0:TURN_BIT:2] | (bits[:, 1:TURN_BIT:2] << 1)
+    return squares.reshape(-1, 9, 9), bits[:, TURN_BIT] + 1
+
+
+def append_game(path: str, board: Board) -> None:
+    """
+    Appends a game to a game log, creating it if needed: the position before the first move
+    of `board.moves`, and the moves.
+    """
+    moves = list(board.moves)
+    start = copy.deepcopy(board)
+    while start.moves:
+        start.undo_move()
+    with _open_log(path, GAMES_MAGIC) as f:
+        f.write(encode_position(start))
+        f.write(len(moves).to_bytes(COUNT_BYTES, "little"))
+        for move in moves:
+            f.write(encode_move(move))
+
+
+def read_games(path: str, team: int = 1):
+    """
+    Reads the games of a game log.
+
+    Returns:
+        Iterator[Tuple]: The start position (a Board) and the moves of every game.
+    """
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    _check_magic(data, GAMES_MAGIC, path)
+    offset = MAGIC_BYTES
+    while offset < len(data):
+        start = decode_position(data[offset : offset + POSITION_BYTES], team)
+        offset += POSITION_BYTES
+        count = int.from_bytes(bytes(data[offset : offset + COUNT_BYTES]), "little")
+        offset += COUNT_BYTES
+        moves = [
+            decode_move(data[offset + k * MOVE_BYTES : offset + (k + 1) * MOVE_BYTES])
+            for k in range(count)
+        ]
+        offset += count * MOVE_BYTES
+        yield start, moves
@@ -0,0 +1,289 @@
+"""
+Headless engine-vs-engine matches, played in parallel by a pool of processes.
+
+Each side has its own search configuration, overriding the search settings of parameters.py
+(DEPTH, TIME_LIMIT, TT, AS, MULTICUT, ORDENING, DEPTH_EXTENSION, QUIESCENCE, LMR, FUTILITY,
+RAZORING, MIRROR_TT). Every opening is played twice, once with each side moving first. The result of every
+game is appended to a JSONL file as soon as it ends, and the match is summarised with the Elo
+difference between the two configurations and its 95% confidence interval.
+
+    python selfplay.py --first '{"DEPTH": 4}' --second '{"DEPTH": 3, "TT": false}' \\
+        --openings 50 --processes 4 --output results.jsonl
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+from multiprocessing import Pool
+import parameters
+from parameters import DEPTH, TIME_LIMIT, MIN, MAX
+
+# Settings of parameters.py a configuration can override, with their default values
+SEARCH_SETTINGS = (
+    "TT",
+    "AS",
+    "MULTICUT",
+    "ORDENING",
+    "DEPTH_EXTENSION",
+    "QUIESCENCE",
+    "LMR",
+    "FUTILITY",
+    "RAZORING",
+    "MIRROR_TT",
+)
+DEFAULT_CONFIG = {
+    "DEPTH": DEPTH,
+    "TIME_LIMIT": TIME_LIMIT,
+    **{name: getattr(parameters, name) for name in SEARCH_SETTINGS},
+}
+
+# Games still going after this many plies are draws
+MAX_PLIES = 200
+
+
+def apply_config(config: dict) -> None:
+    """
+    Sets the search settings of a configuration on the engine module, which reads them
+    as module globals while searching.
+    """
+    import engine
+
+    for name in SEARCH_SETTINGS:
+        setattr(engine, name, config[name])
+
+
+def random_openings(count: int, plies: int, seed: int):
+    """
+    Generates opening positions by playing random legal moves from the initial position.
+
+    Parameters:
+        count (int): Number of openings.
+        plies (int): Number of random moves of every opening.
+        seed (int): Seed of the random moves.
+
+    Returns:
+        List[List[Tuple]]: The moves of every opening.
+    """
+    from states import Board
+
+    rng = random.Random(seed)
+    openings = []
+    for _ in range(count):
+        board = Board(team=1, turn=1)
+        board.create_boards()
+        for _ in range(plies):
+            moves = board.legal_moves()
+            if not moves or board.winner():
+                break
+            board.move_pieces(*rng.choice(moves))
+        openings.append(list(board.moves))
+    return openings
+
+
+def play_game(task):
+    """
+    Plays one game between two configurations from an opening.
+
+    Parameters:
+        task (tuple): The game number, the opening number, the opening moves, the names and configurations
+                      of the side moving first (colour 1) and of the other one (colour 2), and the size
+                      of their transposition tables.
+
+    Returns:
+        dict: The game record: players, winner (a name, or None for a draw), the reason the game ended,
+              the moves, and the nodes searched and time spent by each side.
+    """
+    from states import Board
+    from engine import Engine
+
+    game, opening, opening_moves, names, configs, size = task
+    board = Board(team=1, turn=1)
+    board.create_boards()
+    for move in opening_moves:
+        board.move_pieces(*move)
+
+    engines = {
+        colour: Engine(size=size, workers=1, tt_file=None) for colour in (1, 2)
+    }
+    nodes = {colour: 0 for colour in (1, 2)}
+    elapsed = {colour: 0.0 for colour in (1, 2)}
+
+    winner, reason = 0, "max plies"
+    while len(board.moves) < MAX_PLIES:
+        winner = board.winner()
+        if winner:
+            reason = "last row" if board.legal_moves() else "no moves"
+            break
+        colour = board.turn
+        config = configs[colour - 1]
+        apply_config(config)
+        start_time = time.time()
+        board = engines[colour].think(
+            board, config["DEPTH"], MIN, MAX, time_limit=config["TIME_LIMIT"]
+        )
+        elapsed[colour] += time.time() - start_time
+        nodes[colour] += engines[colour].nodes
+    if not winner:
+        # A game decided by the last allowed ply is not a draw
+        winner = board.winner()
+        if winner:
+            reason = "last row" if board.legal_moves() else "no moves"
+
+    for engine in engines.values():
+        engine.close()
+
+    return {
+        "game": game,
+        "opening": opening,
+        "first": names[0],
+        "second": names[1],
+        "winner": names[winner - 1] if winner else None,
+        "reason": reason,
+        "plies": len(board.moves),
+        "moves": board.moves[len(opening_moves) :],
+        "nodes": {names[0]: nodes[1], names[1]: nodes[2]},
+        "time": {names[0]: round(elapsed[1], 4), names[1]: round(elapsed[2], 4)},
+    }
+
+
+def game_board(moves):
+    """Returns the board reached by playing the moves from the initial position."""
+    from states import Board
+
+    board = Board(team=1, turn=1)
+    board.create_boards()
+    for move in moves:
+        board.move_pieces(*move)
+    return board
+
+
+def elo(score: float) -> float:
+    """Returns the Elo difference corresponding to an expected score."""
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_interval(wins: int, draws: int, losses: int):
+    """
+    Estimates the Elo difference of a player from its results, with a 95% confidence interval
+    computed from the standard error of the mean score per game.
+
+    A score of 0 or 1 (every game lost or won) has no finite Elo difference: its interval is
+    then the one-sided bound of the exact binomial test, e.g. the lowest score that wins all
+    the games with a probability of 2.5%.
+
+    Returns:
+        tuple: The Elo difference and the lower and upper bounds of the interval, each None
+               when it is unbounded, or None when no game was played.
+    """
+    games = wins + draws + losses
+    if games == 0:
+        return None
+    if wins == games:
+        return None, elo(0.025 ** (1 / games)), None
+    if losses == games:
+        return None, None, elo(1 - 0.025 ** (1 / games))
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score**2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    lower = elo(score - margin) if score - margin > 0 else None
+    upper = elo(score + margin) if score + margin < 1 else None
+    return elo(score), lower, upper
+
+
+def format_elo(interval) -> str:
+    """Writes the result of `elo_interval`, e.g. "35.2 [-10.4, 81.9]" or "> 120.5"."""
+    if interval is None:
+        return "no games played"
+    difference, lower, upper = interval
+    if difference is None:
+        return f"> {lower:.1f}" if lower is not None else f"< {upper:.1f}"
+    return (
+        f"{difference:.1f} ["
+        + (f"{lower:.1f}" if lower is not None else "-inf")
+        + ", "
+        + (f"{upper:.1f}" if upper is not None else "+inf")
+        + "]"
+    )
+
+
+def match(
+    first: dict, second: dict, openings, processes: int, output: str, size: int, record: str = None
+) -> None:
+    """
+    Plays every opening twice between two configurations, once with each moving first, writing
+    every game record to `output` as it ends, and prints the results and the Elo difference.
+
+    Parameters:
+        first (dict): Settings of the first configuration, over DEFAULT_CONFIG.
+        second (dict): Settings of the second configuration, over DEFAULT_CONFIG.
+        openings (List[List[Tuple]]): The moves of every opening.
+        processes (int): Number of processes playing games in parallel.
+        output (str): Path of the JSONL file of the game records.
+        size (int): Size of the transposition table of every engine.
+        record (str): Optional path of a binary game log (see records.py) every game is appended to.
+    """
+    from records import append_game
+
+    names = ("first", "second")
+    configs = {
+        "first": {**DEFAULT_CONFIG, **first},
+        "second": {**DEFAULT_CONFIG, **second},
+    }
+    tasks = []
+    for opening, moves in enumerate(openings):
+        for order in (names, names[::-1]):
+            tasks.append(
+                (len(tasks), opening, moves, order, [configs[name] for name in order], size)
+            )
+
+    results = {"first": 0, "second": 0, None: 0}
+    start_time = time.time()
+    with Pool(processes) as pool, open(output, "w") as f:
+        for game in pool.imap_unordered(play_game, tasks):
+            f.write(json.dumps(game) + "\n")
+            f.flush()
+            if record is not None:
+                append_game(record, game_board(openings[game["opening"]] + game["moves"]))
+            results[game["winner"]] += 1
+            print(
+                f"game {game['game'] + 1}/{len(tasks)}: {game['first']} vs {game['second']}, "
+                f"winner: {game['winner']} ({game['reason']}, {game['plies']} plies)"
+            )
+
+    wins, losses, draws = results["first"], results["second"], results[None]
+    print("-" * 50)
+    print(f"Games played: {len(tasks)} in {time.time() - start_time:.2f} seconds")
+    print(f"first: {configs['first']}")
+    print(f"second: {configs['second']}")
+    print(f"Results of first: +{wins} ={draws} -{losses}")
+    print(f"Elo of first against second: {format_elo(elo_interval(wins, draws, losses))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fianco engine-vs-engine matches")
+    parser.add_argument("--first", type=json.loads, default={}, help="JSON settings of the first engine")
+    parser.add_argument("--second", type=json.loads, default={}, help="JSON settings of the second engine")
+    parser.add_argument("--openings", type=int, default=10, help="number of random openings")
+    parser.add_argument("--opening-plies", type=int, default=4)
+    parser.add_argument("--opening-file", help="JSONL file with the moves of one opening per line")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--size", type=int, default=2**18, help="transposition table entries per engine")
+    parser.add_argument("--output", default="selfplay.jsonl")
+    parser.add_argument("--record", help="binary game log the games are appended to")
+    args = parser.parse_args()
+
+    if args.opening_file:
+        with open(args.opening_file) as f:
+            openings = [[tuple(move) for move in json.loads(line)] for line in f if line.strip()]
+    else:
+        openings = random_openings(args.openings, args.opening_plies, args.seed)
+    match(
+        args.first, args.second, openings, args.processes, args.output, args.size, args.record
+    )
@@ -0,0 +1,221 @@
+"""
+Lazy SMP: parallel search of the same root by several worker processes.
+
+All the workers share one transposition table, stored in `multiprocessing.shared_memory`
+(or in the memory-mapped table file of the engine, when it has one).
+The entries of `TranspositionTable` hold the Zobrist key XOR-ed with the data, so an entry
+torn by two workers writing at the same time fails the key check and is simply ignored:
+no locking is needed. The workers help each other only through the table, searching at
+slightly different depths so that they do not all follow the same path.
+
+Run this module to benchmark the speedup against the number of workers:
+
+    python smp.py --depth 6 --workers 1 2 4 8
+"""
+
+import argparse
+import atexit
+import multiprocessing as mp
+import random
+import time
+from multiprocessing import shared_memory
+import numpy as np
+from parameters import SIZE, BUCKET_SIZE, MIN, MAX
+
+
+def _worker(index, shm_name, table_file, size, bucket_size, tasks, results, stop):
+    """
+    Main loop of a worker process: searches the boards received on `tasks` with its own Engine,
+    backed by the shared transposition table, and puts the results on `results`.
+
+    Worker `index` searches one ply deeper when it is odd, and stops when `stop` is set.
+    """
+    from engine import Engine
+    from transposition import TranspositionTable
+
+    if table_file is not None:
+        shm = None
+        table = TranspositionTable.open(table_file, size, bucket_size).table
+    else:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        table = np.ndarray((size, 2), dtype=np.uint64, buffer=shm.buf)
+    engine = Engine(size=size, bucket_size=bucket_size, table=table, workers=1)
+    engine.stop_event = stop
+    offset = index % 2
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        board, depth, alpha, beta, time_limit, generation = task
+        engine.t_table.generation = generation
+        engine.nodes = 0
+        score, best_move, reached = engine.iterative_deepening(
+            board, depth + offset, alpha, beta, time_limit
+        )
+        results.put((index, reached, score, best_move, engine.nodes))
+
+    del table
+    if shm is not None:
+        shm.close()
+
+
+class LazySMP:
+    """
+    A pool of worker processes searching the same root in parallel, sharing one transposition table.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        size: int = SIZE,
+        bucket_size: int = BUCKET_SIZE,
+        table_file: str = None,
+    ) -> None:
+        """
+        Creates the shared transposition table and starts the worker processes.
+
+        Parameters:
+            workers (int): Number of worker processes.
+            size (int): Number of entries of the shared transposition table.
+            bucket_size (int): Number of entries per bucket of the transposition table.
+            table_file (str): Optional table file (see `TranspositionTable.open`) mapped by the workers
+                              instead of a new shared memory block. Its entries are kept.
+        """
+        self.workers = workers
+        self.size = (size // bucket_size) * bucket_size
+        self.running = True
+        if table_file is not None:
+            self.shm = None
+            self.table = None
+        else:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.size * 16)
+            self.table = np.ndarray(
+                (self.size, 2), dtype=np.uint64, buffer=self.shm.buf
+            )
+            self.table.fill(0)
+
+        self.stop = mp.Event()
+        self.results = mp.Queue()
+        self.tasks = [mp.Queue() for _ in range(workers)]
+        self.processes = [
+            mp.Process(
+                target=_worker,
+                args=(
+                    index,
+                    self.shm.name if self.shm is not None else None,
+                    table_file,
+                    self.size,
+                    bucket_size,
+                    self.tasks[index],
+                    self.results,
+                    self.stop,
+                ),
+                daemon=True,
+            )
+            for index in range(workers)
+        ]
+        for process in self.processes:
+            process.start()
+        atexit.register(self.close)
+
+    def search(self, board, depth: int, alpha, beta, time_limit, generation: int):
+        """
+        Searches the board with every worker and returns the result of the deepest completed search.
+
+        Without a time limit, the search ends as soon as one worker completes `depth`: the others are
+        stopped and report their last completed iteration. With a time limit, every worker deepens
+        iteratively until the deadline.
+
+        Parameters:
+            board (Board): The current board state.
+            depth (int): The (maximum) search depth.
+            alpha (float): The alpha value for alpha-beta pruning.
+            beta (float): The beta value for alpha-beta pruning.
+            time_limit (float): Optional time budget in seconds.
+            generation (int): Generation of the transposition table entries stored by this search.
+
+        Returns:
+            tuple: The best score, the best move, the depth reached and the nodes searched by all the workers.
+        """
+        self.stop.clear()
+        for tasks in self.tasks:
+            tasks.put((board, depth, alpha, beta, time_limit, generation))
+
+        results = []
+        while len(results) < self.workers:
+            result = self.results.get()
+            results.append(result)
+            if time_limit is None and result[1] >= depth:
+                self.stop.set()
+        self.stop.clear()
+
+        # Deepest completed search, the first one to finish on ties
+        _, reached, score, best_move, _ = max(results, key=lambda result: result[1])
+        nodes = sum(result[4] for result in results)
+        return score, best_move, reached, nodes
+
+    def close(self) -> None:
+        """Stops the worker processes and releases the shared transposition table."""
+        if not self.running:
+            return
+        self.running = False
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        self.table = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+def benchmark(depth: int, workers, positions: int, seed: int) -> None:
+    """
+    Prints the time taken to search a set of random positions at a fixed depth for every number
+    of workers, and the speedup against the first one.
+    """
+    from states import Board
+    from engine import Engine
+
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(positions):
+        board = Board(team=1, turn=1)
+        board.create_boards()
+        for _ in range(rng.randint(4, 12)):
+            moves = board.legal_moves()
+            if not moves:
+                break
+            board.move_pieces(*rng.choice(moves))
+        boards.append(board)
+
+    baseline = None
+    for n in workers:
+        engine = Engine(size=SIZE, workers=n)
+        start_time = time.time()
+        nodes = 0
+        for board in boards:
+            engine.clear_table()
+            engine.think(board, depth, MIN, MAX)
+            nodes += engine.nodes
+        elapsed_time = time.time() - start_time
+        engine.close()
+        baseline = baseline or elapsed_time
+        print(
+            f"workers: {n:2d}  time: {elapsed_time:8.3f}s  nodes: {nodes:9d}  "
+            f"speedup: {baseline / elapsed_time:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lazy SMP speedup benchmark")
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--positions", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    benchmark(args.depth, args.workers, args.positions, args.seed)
@@ -1,8 +1,86 @@
 from typing import List
 import numpy as np
-import pygame
 import math
-import copy
+from parameters import ZOBRIST_SEED
+from bitboard import (
+    NUM_SQUARES,
+    SQUARES,
+    ROWS,
+    INNER,
+    FULL,
+    bit,
+    iter_bits,
+    generate_moves,
+    generate_captures,
+    generate_quiets,
+    has_capture,
+)
+
+
+def _zobrist_keys(seed: int, count: int) -> List[int]:
+    """
+    Generates `count` 63-bit Zobrist keys with SplitMix64. The keys only depend on the seed, and
+    are generated in pure Python: loading `numpy.random` would cost more than the rest of the import.
+    """
+    keys = []
+    state = seed
+    for _ in range(count):
+        state = (state + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        z = state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        keys.append((z ^ (z >> 31)) >> 1)
+    return keys
+
+
+# Zobrist keys shared by every Board and the Engine: one per (row, column, colour) and one for
+# black to move. ZOBRIST_KEYS holds the same piece keys as Python ints indexed by [colour][square].
+# The keys are seeded, so hashes (and transposition tables saved to disk) are the same in every run.
+_zobrist = _zobrist_keys(ZOBRIST_SEED, NUM_SQUARES * 3 + 1)
+ZOBRIST_TABLE = np.array(_zobrist[:-1], dtype=np.int64).reshape(9, 9, 3)
+ZOBRIST_TURN = _zobrist[-1]
+ZOBRIST_KEYS = [_zobrist[colour : NUM_SQUARES * 3 : 3] for colour in range(3)]
+
+# The square reflected left-right, and the keys of the pieces of the reflected position:
+# ZOBRIST_MIRROR_KEYS[colour][s] is the key of the square s is reflected to, so XOR-ing them
+# over the pieces gives the Zobrist hash of the mirrored position
+MIRROR_SQUARES = [i * 9 + 8 - j for i, j in SQUARES]
+ZOBRIST_MIRROR_KEYS = [[keys[m] for m in MIRROR_SQUARES] for keys in ZOBRIST_KEYS]
+
+# Weights of the utility function
+POSITION_WEIGHT = 10
+PIECE_WEIGHT = 10
+VULNERABILITY_PENALTY = 100
+PROMOTION_SCORE = 1000000
+
+
+def _piece_square_values(team: int):
+    """
+    Builds the value of a piece of every colour on every square, from the point of view of `team`:
+    material, advancement and reaching the last row for the team's pieces, material and reaching
+    the last row for the opponent's ones. Indexed by [colour][square].
+    """
+    values = [[0] * NUM_SQUARES for _ in range(3)]
+    for s, (i, _) in enumerate(SQUARES):
+        values[team][s] = PIECE_WEIGHT + ((8 - i) ** 2) * POSITION_WEIGHT
+        if i == 0:
+            values[team][s] += PROMOTION_SCORE
+        values[3 - team][s] = -PIECE_WEIGHT
+        if i == 8:
+            values[3 - team][s] -= PROMOTION_SCORE
+    return values
+
+
+PIECE_SQUARE_VALUES = {team: _piece_square_values(team) for team in (1, 2)}
+
+
+def mirror_move(move):
+    """Returns the move (oi, oj, i, j) reflected left-right, as played in the mirrored position."""
+    oi, oj, i, j = move
+    return oi, 8 - oj, i, 8 - j
+
+# Symbols of the colours in the text notation of a position (see `Board.to_string`)
+PIECE_SYMBOLS = ".wb"
 
 
 class Board:
@@ -20,8 +98,10 @@ class Board:
         self.win = False
         self.game_over = False
         self.moves = []
-        # Game board
-        self.board = np.zeros((9, 9), dtype=int)
+        # Undo information of every move in `moves`: the colour of the captured piece, or 0
+        self.undo_stack = []
+        # Game board: one bitboard per colour, indexed by the colour (index 0 is unused)
+        self.pieces = [0, 0, 0]
         # Score and utility
         self.score = -math.inf
         self.utility = 0
@@ -32,38 +112,159 @@ class Board:
         self.upper_bound = math.inf
         self.lower_bound = -math.inf
 
+        # Sum of the piece-square values of every piece, kept up to date by `move_pieces` and `undo_move`
+        self.piece_score = self.compute_piece_score()
+
         # Auxiliary variables
-        self.zobrist = 0
+        self.zobrist = self.compute_zobrist()
+        self.zobrist_mirror = self.compute_zobrist(mirror=True)
         self.flag = None
         self.depth = 0
 
+    @property
+    def board(self) -> np.ndarray:
+        """
+        9x9 array view of the position (0 for empty squares, 1 and 2 for the two colours).
+
+        The array is rebuilt from the bitboards on every access, so it is meant for rendering
+        and inspection only: writing into it does not change the position.
+        """
+        board = np.zeros(NUM_SQUARES, dtype=int)
+        for colour in (1, 2):
+            for s in iter_bits(self.pieces[colour]):
+                board[s] = colour
+        return board.reshape(9, 9)
+
+    @board.setter
+    def board(self, board) -> None:
+        self.pieces = [0, 0, 0]
+        for (i, j), value in np.ndenumerate(board):
+            if value:
+                self.pieces[value] |= bit(i, j)
+        self.zobrist = self.compute_zobrist()
+        self.zobrist_mirror = self.compute_zobrist(mirror=True)
+        self.piece_score = self.compute_piece_score()
+
+    def piece_at(self, i, j) -> int:
+        """Returns the colour of the piece in (i, j), or 0 if the square is empty."""
+        b = bit(i, j)
+        if self.pieces[1] & b:
+            return 1
+        if self.pieces[2] & b:
+            return 2
+        return 0
+
     def create_boards(
         self,
     ):
         # Black
-
-        board = self.board
-        board[0, :] = 2
-        board[1, 1] = 2
-        board[1, 7] = 2
-        board[2, 2] = 2
-        board[2, 6] = 2
-        board[3, 3] = 2
-        board[3, 5] = 2
+        black = bit(1, 1) | bit(1, 7) | bit(2, 2) | bit(2, 6) | bit(3, 3) | bit(3, 5)
+        self.pieces[2] = ROWS[0] | black
 
         # White
-        board[8, :] = 1
-        board[7, 1] = 1
-        board[7, 7] = 1
-        board[6, 2] = 1
-        board[6, 6] = 1
-        board[5, 3] = 1
-        board[5, 5] = 1
+        white = bit(7, 1) | bit(7, 7) | bit(6, 2) | bit(6, 6) | bit(5, 3) | bit(5, 5)
+        self.pieces[1] = ROWS[8] | white
+
+        self.zobrist = self.compute_zobrist()
+        self.zobrist_mirror = self.compute_zobrist(mirror=True)
+        self.piece_score = self.compute_piece_score()
+
+    @classmethod
+    def from_string(cls, text: str, team: int = 1):
+        """
+        Creates a board from its text notation (see `to_string`). Raises ValueError unless the
+        text is 9 rows of 9 squares followed by the player to move, "w" or "b".
+
+        Parameters:
+            text (str): The position, e.g. "bbbbbbbbb/1b5b1/2b3b2/3b1b3/9/3w1w3/2w3w2/1w5w1/wwwwwwwww w".
+            team (int): The colour that moves up the board.
+
+        Returns:
+            Board: The board, with its Zobrist hash and piece score computed.
+        """
+        fields = text.split()
+        if len(fields) != 2:
+            raise ValueError(f"invalid position {text}: expected the rows and the player to move")
+        rows, turn = fields[0].split("/"), fields[1]
+        if turn not in ("w", "b"):
+            raise ValueError(f"invalid player to move {turn}")
+        if len(rows) != 9:
+            raise ValueError(f"invalid position {text}: expected 9 rows, got {len(rows)}")
+        board = cls(team=team, turn=PIECE_SYMBOLS.index(turn))
+        for i, row in enumerate(rows):
+            j = 0
+            for symbol in row:
+                if symbol.isdigit():
+                    j += int(symbol)
+                elif symbol in ("w", "b"):
+                    if j < 9:
+                        board.pieces[PIECE_SYMBOLS.index(symbol)] |= bit(i, j)
+                    j += 1
+                else:
+                    raise ValueError(f"invalid piece {symbol}")
+            if j != 9:
+                raise ValueError(f"invalid row {row}: expected 9 squares, got {j}")
+        board.zobrist = board.compute_zobrist()
+        board.zobrist_mirror = board.compute_zobrist(mirror=True)
+        board.piece_score = board.compute_piece_score()
+        return board
+
+    def to_string(self) -> str:
+        """
+        Returns the text notation of the position: the rows from row 0 to row 8 separated by "/",
+        with "w" for the pieces of colour 1, "b" for the pieces of colour 2 and the number of
+        consecutive empty squares, followed by the colour to move.
+        """
+        rows = []
+        for i in range(9):
+            row, empty = "", 0
+            for j in range(9):
+                colour = self.piece_at(i, j)
+                if colour:
+                    row += (str(empty) if empty else "") + PIECE_SYMBOLS[colour]
+                    empty = 0
+                else:
+                    empty += 1
+            rows.append(row + (str(empty) if empty else ""))
+        return "/".join(rows) + " " + PIECE_SYMBOLS[self.turn]
+
+    def compute_zobrist(self, mirror: bool = False) -> int:
+        """
+        Computes the Zobrist hash of the position from scratch: the keys of every piece and,
+        when black is to move, the side-to-move key. `move_pieces` and `undo_move` keep
+        `zobrist` and `zobrist_mirror` up to date incrementally, so this is only needed when
+        the position is set up.
+
+        Parameters:
+            mirror (bool): Whether to compute the hash of the position reflected left-right.
+
+        Returns:
+            int: The Zobrist hash.
+        """
+        zobrist_value = ZOBRIST_TURN if self.turn == 2 else 0
+        for colour in (1, 2):
+            keys = (ZOBRIST_MIRROR_KEYS if mirror else ZOBRIST_KEYS)[colour]
+            for s in iter_bits(self.pieces[colour]):
+                zobrist_value ^= keys[s]
+        return zobrist_value
+
+    def compute_piece_score(self) -> int:
+        """
+        Computes from scratch the material, positional and promotion terms of the utility function,
+        as the sum of the piece-square values of every piece from the team's point of view.
+        """
+        values = PIECE_SQUARE_VALUES[self.team]
+        score = 0
+        for colour in (1, 2):
+            for s in iter_bits(self.pieces[colour]):
+                score += values[colour][s]
+        return score
 
     def possible_moves_f(self, i, j) -> None:
         """Calculate possible moves for the piece based on its current position."""
 
-        direction = -1 if self.board[i, j] == self.team else 1
+        colour = self.piece_at(i, j)
+        direction = -1 if colour == self.team else 1
         moves_dict = {
             (i + direction, j): False,  # Simple forward move
             (i + 2 * direction, j - 2): False,  # Capture move (left)
@@ -74,56 +275,107 @@ class Board:
             (i - 2 * direction, j + 2): False,  # Backward capture (right)
             (i - 2 * direction, j - 2): False,  # Backward capture (left)
         }
+        empty = FULL ^ (self.pieces[1] | self.pieces[2])
+        opponent = self.pieces[3 - colour]
 
         # Check simple forward move
         if 0 <= i + direction < 9:
-            if self.board[i + direction][j] == 0:  # Check if the cell is empty
+            if empty & bit(i + direction, j):  # Check if the cell is empty
                 moves_dict[(i + direction, j)] = True
 
         # Check horizontal moves
-        if j - 1 >= 0 and self.board[i][j - 1] == 0:
+        if j - 1 >= 0 and empty & bit(i, j - 1):
             moves_dict[(i, j - 1)] = True
-        if j + 1 < 9 and self.board[i][j + 1] == 0:
+        if j + 1 < 9 and empty & bit(i, j + 1):
             moves_dict[(i, j + 1)] = True
 
         # Check capture moves
         if 0 <= i + 2 * direction < 9:
             # Check left capture
             if j - 2 >= 0:
-                if self.board[i, j] == 1:
-                    if (
-                        self.board[i + direction][j - 1] == 2
-                        and self.board[i + 2 * direction][j - 2] == 0
-                    ):
-                        moves_dict[(i + 2 * direction, j - 2)] = True
-                elif self.board[i, j] == 2:
-                    if (
-                        self.board[i + direction][j - 1] == 1
-                        and self.board[i + 2 * direction][j - 2] == 0
-                    ):
-                        moves_dict[(i + 2 * direction, j - 2)] = True
-
-        # Check right capture
-        if 0 <= i + 2 * direction < 9:
+                if opponent & bit(i + direction, j - 1) and empty & bit(
+                    i + 2 * direction, j - 2
+                ):
+                    moves_dict[(i + 2 * direction, j - 2)] = True
+
+            # Check right capture
             if j + 2 < 9:
-                if self.board[i, j] == 1:
-                    if (
-                        self.board[i + direction][j + 1] == 2
-                        and self.board[i + 2 * direction][j + 2] == 0
-                    ):
-                        moves_dict[(i + 2 * direction, j + 2)] = True
-                elif self.board[i, j] == 2:
-                    if (
-                        self.board[i + direction][j + 1] == 1
-                        and self.board[i + 2 * direction][j + 2] == 0
-                    ):
-                        moves_dict[(i + 2 * direction, j + 2)] = True
+                if opponent & bit(i + direction, j + 1) and empty & bit(
+                    i + 2 * direction, j + 2
+                ):
+                    moves_dict[(i + 2 * direction, j + 2)] = True
 
         return moves_dict
 
+    def legal_moves(self) -> List[tuple]:
+        """
+        Generates the legal moves of the player to move directly from the bitboards,
+        applying the mandatory capture rule.
+
+        Returns:
+            List[Tuple]: The legal moves as (oi, oj, i, j) tuples, in the same order as
+                         scanning the board and `possible_moves_f`.
+        """
+        return generate_moves(
+            self.pieces[self.turn], self.pieces[3 - self.turn], self.turn == self.team
+        )
+
+    def winner(self) -> int:
+        """
+        Checks whether the game is over: a player wins by reaching the opposite last row, and loses
+        when it has no legal moves on its turn (which includes having no pieces left).
+
+        Returns:
+            int: The colour of the winner, or 0 if the game is not over.
+        """
+        for colour in (1, 2):
+            last_row = ROWS[0] if colour == self.team else ROWS[8]
+            if self.pieces[colour] & last_row:
+                return colour
+        if not self.legal_moves():
+            return 3 - self.turn
+        return 0
+
+    def capture_moves(self) -> List[tuple]:
+        """Generates the capturing moves of the player to move (the only legal ones when there are any)."""
+        return generate_captures(
+            self.pieces[self.turn], self.pieces[3 - self.turn], self.turn == self.team
+        )
+
+    def quiet_moves(self) -> List[tuple]:
+        """Generates the non-capturing moves of the player to move, ignoring the mandatory capture rule."""
+        return generate_quiets(
+            self.pieces[self.turn], self.pieces[3 - self.turn], self.turn == self.team
+        )
+
+    def is_legal(self, move) -> bool:
+        """
+        Checks whether a move (oi, oj, i, j), for example one taken from the transposition table,
+        is legal for the player to move without generating all the legal moves.
+        """
+        oi, oj, i, j = move
+        own = self.pieces[self.turn]
+        opponent = self.pieces[3 - self.turn]
+        if not own & bit(oi, oj) or (own | opponent) & bit(i, j):
+            return False
+        up = self.turn == self.team
+        direction = -1 if up else 1
+        if abs(i - oi) == 2:
+            return (
+                i - oi == 2 * direction
+                and abs(j - oj) == 2
+                and bool(opponent & bit((i + oi) // 2, (j + oj) // 2))
+            )
+        if has_capture(own, opponent, up):
+            return False
+        return (i - oi == direction and j == oj) or (i == oi and abs(j - oj) == 1)
+
     def create_new_board(self, oi, oj, i, j):
         new_board = Board(team=self.team, turn=self.turn)
-        new_board.board = copy.deepcopy(self.board)
+        new_board.pieces = list(self.pieces)
+        new_board.zobrist = self.zobrist
+        new_board.zobrist_mirror = self.zobrist_mirror
+        new_board.piece_score = self.piece_score
         new_board.move_number = self.move_number
         new_board.win = self.win
         new_board.game_over = self.game_over
@@ -131,13 +383,37 @@ class Board:
         return new_board
 
     def move_pieces(self, oi, oj, i, j):
-        self.board[i, j] = self.board[oi, oj]
-        self.board[oi, oj] = 0
+        """
+        Applies the move (oi, oj) -> (i, j) in place and pushes what is needed to revert it,
+        including the colour of a captured piece, on `undo_stack`. The Zobrist hashes of the
+        position and of its mirror image are updated by XOR-ing the keys of the moved and captured
+        pieces and the side-to-move key, and the piece score by the piece-square values of the
+        moved and captured pieces.
+        """
+        pieces = self.pieces
+        origin = oi * 9 + oj
+        target = i * 9 + j
+        colour = 1 if pieces[1] >> origin & 1 else 2
+        keys = ZOBRIST_KEYS[colour]
+        mirrorKeys = ZOBRIST_MIRROR_KEYS[colour]
+        values = PIECE_SQUARE_VALUES[self.team]
+        pieces[colour] ^= (1 << origin) | (1 << target)
+        zobrist = self.zobrist ^ keys[origin] ^ keys[target] ^ ZOBRIST_TURN
+        zobristMirror = self.zobrist_mirror ^ mirrorKeys[origin] ^ mirrorKeys[target] ^ ZOBRIST_TURN
+        piece_score = self.piece_score + values[colour][target] - values[colour][origin]
         self.moves.append((oi, oj, i, j))
+        captured = 0
         if abs(i - oi) == 2:
-            mid_i = (i + oi) // 2
-            mid_j = (j + oj) // 2
-            self.board[mid_i, mid_j] = 0
+            captured = 3 - colour
+            middle = (origin + target) // 2
+            pieces[captured] &= ~(1 << middle)
+            zobrist ^= ZOBRIST_KEYS[captured][middle]
+            zobristMirror ^= ZOBRIST_MIRROR_KEYS[captured][middle]
+            piece_score -= values[captured][middle]
+        self.undo_stack.append(captured)
+        self.zobrist = zobrist
+        self.zobrist_mirror = zobristMirror
+        self.piece_score = piece_score
 
         self.turn = 2 if self.turn == 1 else 1
         self.move_number += 1
@@ -145,16 +421,14 @@ class Board:
     def handle_capture(self):
         """Handles the capture logic for available pieces."""
         self.capture_available = False
-        capture_pieces = []
-        for i in range(9):
-            for j in range(9):
-                if self.board[i, j] == self.turn:
-                    direction = -1 if self.board[i, j] == self.team else 1
-                    possible_moves = self.possible_moves_f(i, j)
-                    self.possible_moves[(i, j)] = possible_moves
+        self.possible_moves = {}
+        for s in iter_bits(self.pieces[self.turn]):
+            i, j = SQUARES[s]
+            possible_moves = self.possible_moves_f(i, j)
+            self.possible_moves[(i, j)] = possible_moves
 
-                    if self.is_capture_possible(i, j):
-                        self.capture_available = True
+            if self.is_capture_possible(i, j):
+                self.capture_available = True
 
         if self.capture_available:
             self.disable_non_capture_moves()
@@ -174,14 +448,13 @@ class Board:
         return False
 
     def disable_non_capture_moves(self):
-        for i in range(9):
-            for j in range(9):
-                if self.board[i, j] == self.turn:
-                    for move in list(self.possible_moves[(i, j)].keys()):
-                        if abs(move[0] - i) != 2 or abs(move[1] - j) != 2:
-                            self.possible_moves[(i, j)][move] = False
+        for s in iter_bits(self.pieces[self.turn]):
+            i, j = SQUARES[s]
+            for move in list(self.possible_moves[(i, j)].keys()):
+                if abs(move[0] - i) != 2 or abs(move[1] - j) != 2:
+                    self.possible_moves[(i, j)][move] = False
 
-    def utility_function(self) -> None:
+    def utility_function(self) -> int:
         """
         Evaluates the utility of the current board state based on factors like piece positions, captures,
         and the difference in the number of pieces between the two teams. Positive values favor the current player,
@@ -191,45 +464,32 @@ class Board:
         - POSITION_WEIGHT: Encourages advancing pieces further up the board.
         - PIECE_WEIGHT: Rewards having more pieces than the opponent.
         - VULNERABILITY_PENALTY: Penalizes pieces that are vulnerable to capture.
+        - PROMOTION_SCORE: Rewards pieces that reached the last row.
 
-        The utility value is adjusted based on the current board configuration.
-        """
-        POSITION_WEIGHT = 10
-        PIECE_WEIGHT = 10
-        VULNERABILITY_PENALTY = 100
-        num_opponent_pieces = 0
-        num_pieces = 0
-        position_score = 0
-        captures = 0
-        for i in range(9):
-            for j in range(9):
-                if self.board[i, j] != 0:
-
-                    if self.board[i, j] == self.team:
-
-                        if i == 0:
-                            self.utility += 1000000
-
-                        position_score += ((8 - i) ** 2) * POSITION_WEIGHT
+        The material, position and promotion terms are kept up to date in `piece_score` by every move and undo,
+        so only the vulnerability term is computed here, with a few operations on the bitboards.
 
-                        num_pieces += 1
-
-                        num_threats = self.count_threats(i, j)
-
-                        captures += num_threats
+        Returns:
+            int: The utility, which is also stored in `utility`.
+        """
+        own = self.pieces[self.team]
+        opponent = self.pieces[3 - self.team]
 
-                    if self.board[i, j] != self.team:
+        # Pieces with an opponent diagonally in front and an empty square diagonally behind
+        empty = FULL ^ (own | opponent)
+        inner = own & INNER
+        captures = (inner & (opponent << 8) & (empty >> 8)).bit_count()
+        captures += (inner & (opponent << 10) & (empty >> 10)).bit_count()
 
-                        if i == 8:
-                            self.utility -= 1000000
-                        num_opponent_pieces += 1
-        self.utility -= captures * VULNERABILITY_PENALTY
-        self.utility += position_score
-        self.utility += (num_pieces - num_opponent_pieces) * PIECE_WEIGHT
+        self.utility = self.piece_score - captures * VULNERABILITY_PENALTY
+        return self.utility
 
     def count_threats(self, i, j) -> int:
         num_threats = 0
-        direction = -1 if self.board[i, j] == self.team else 1
+        colour = self.piece_at(i, j)
+        direction = -1 if colour == self.team else 1
+        opponent = self.pieces[3 - colour]
+        empty = FULL ^ (self.pieces[1] | self.pieces[2])
         piece_behind = i - direction
         if (
             i + direction < 9
@@ -240,126 +500,50 @@ class Board:
             and j - 1 >= 0
         ):
 
-            if self.board[i + direction, j + 1] == 2:
-                if self.board[piece_behind, j - 1] == 0:
+            if opponent & bit(i + direction, j + 1):
+                if empty & bit(piece_behind, j - 1):
 
                     num_threats += 1
 
-            if self.board[i + direction, j - 1] == 2:
-                if self.board[piece_behind, j + 1] == 0:
+            if opponent & bit(i + direction, j - 1):
+                if empty & bit(piece_behind, j + 1):
 
                     num_threats += 1
         return num_threats
 
     def undo_move(self):
-        self.turn = 1 if self.turn == 2 else 2
-        move = self.moves.pop()
-        self.move_pieces(move[2], move[3], move[0], move[1])
-        self.turn = 1 if self.turn == 2 else 2
-
-        if abs(move[2] - move[0]) == 2:
-            print("Undoing capture")
-            mid_i = (move[2] + move[0]) // 2
-            mid_j = (move[3] + move[1]) // 2
-            self.board[mid_i, mid_j] = 1 if self.turn == 2 else 2
-
-
-class PygameEnviroment:  # class for the pygame enviroment
-    def __init__(self, board_obj: Board) -> None:
-        self.board_obj = board_obj
-        self.selected_piece = None
-
-    def show(self, screen, screen_size, grid_size, cell_size, PCOLOR):
-        font = pygame.font.Font(None, 36)
-        letters = "abcdefghi"
-        if PCOLOR == 1:
-            numbers_team_1 = "987654321"
-            numbers_team_2 = "123456789"
-
-        else:
-            numbers_team_1 = "123456789"
-            numbers_team_2 = "987654321"
-        purple_color = (128, 0, 128)
-
-        numbers = numbers_team_1 if self.board_obj.team == 1 else numbers_team_2
-        for i in range(9):
-            for j in range(9):
-                square = self.board_obj.board[i, j]
-
-                color = (0, 0, 0)
-                if square == 1 or square == 2:
-                    if PCOLOR == 1:
-                        pygame.draw.circle(
-                            screen,
-                            color,
-                            (
-                                j * cell_size + cell_size // 2,
-                                i * cell_size + cell_size // 2,
-                            ),
-                            cell_size // 2 - 5,
-                            4 if square == 1 else 0,
-                        )
-
-                    else:
-                        pygame.draw.circle(
-                            screen,
-                            color,
-                            (
-                                j * cell_size + cell_size // 2,
-                                i * cell_size + cell_size // 2,
-                            ),
-                            cell_size // 2 - 5,
-                            0 if square == 1 else 4,
-                        )
-
-        if self.selected_piece is not None:
-            pygame.draw.circle(
-                screen,
-                purple_color,
-                (
-                    self.selected_piece[1] * cell_size + cell_size / 2,
-                    self.selected_piece[0] * cell_size + cell_size / 2,
-                ),
-                cell_size // 5 - 5 + 4,
-            )
-            if (
-                self.selected_piece[0],
-                self.selected_piece[1],
-            ) in self.board_obj.possible_moves:
-                for move in self.board_obj.possible_moves[
-                    (self.selected_piece[0], self.selected_piece[1])
-                ]:
-
-                    if self.board_obj.possible_moves[
-                        (self.selected_piece[0], self.selected_piece[1])
-                    ][move]:
-                        center = (
-                            move[1] * cell_size + cell_size // 2,
-                            move[0] * cell_size + cell_size // 2,
-                        )
-                        pygame.draw.circle(screen, (0, 255, 0), center, 15)
-
-        for x in range(0, grid_size, cell_size):
-            for y in range(0, grid_size, cell_size):
-                rect = pygame.Rect(x, y, cell_size, cell_size)
-                pygame.draw.rect(screen, purple_color, rect, 1)
-
-                col = x // cell_size
-                row = y // cell_size
-                notation = f"{letters[col]}{numbers[row]}"
-
-                text = font.render(notation, True, (0, 0, 0))
-                text_rect = text.get_rect(
-                    center=(x + cell_size // 2, y + cell_size // 2)
-                )
-                screen.blit(text, text_rect)
-        if PCOLOR == 1:
-
-            player_text = "White's Turn" if self.board_obj.turn == 1 else "Black's Turn"
-        else:
-            player_text = "Black's Turn" if self.board_obj.turn == 1 else "White's Turn"
-        player_text_rendered = font.render(player_text, True, (0, 0, 0))
-        player_text_rect = player_text_rendered.get_rect(
-            center=(screen_size[0] - 80, screen_size[1] - 20)
-        )
-        screen.blit(player_text_rendered, player_text_rect)
+        """Reverts the last move applied with `move_pieces`, restoring a captured piece."""
+        oi, oj, i, j = self.moves.pop()
+        captured = self.undo_stack.pop()
+        pieces = self.pieces
+        origin = oi * 9 + oj
+        target = i * 9 + j
+        colour = 1 if pieces[1] >> target & 1 else 2
+        keys = ZOBRIST_KEYS[colour]
+        mirrorKeys = ZOBRIST_MIRROR_KEYS[colour]
+        values = PIECE_SQUARE_VALUES[self.team]
+        pieces[colour] ^= (1 << origin) | (1 << target)
+        zobrist = self.zobrist ^ keys[origin] ^ keys[target] ^ ZOBRIST_TURN
+        zobristMirror = self.zobrist_mirror ^ mirrorKeys[origin] ^ mirrorKeys[target] ^ ZOBRIST_TURN
+        piece_score = self.piece_score + values[colour][origin] - values[colour][target]
+        if captured:
+            middle = (origin + target) // 2
+            pieces[captured] |= 1 << middle
+            zobrist ^= ZOBRIST_KEYS[captured][middle]
+            zobristMirror ^= ZOBRIST_MIRROR_KEYS[captured][middle]
+            piece_score += values[captured][middle]
+        self.zobrist = zobrist
+        self.zobrist_mirror = zobristMirror
+        self.piece_score = piece_score
+
+        self.turn = 2 if self.turn == 1 else 1
+        self.move_number -= 1
+
+
+def __getattr__(name):
+    # The rendering lives in display.py, so that importing the game logic does not load pygame
+    if name == "PygameEnviroment":
+        from display import PygameEnviroment
+
+        return PygameEnviroment
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,141 @@
+"""
+Statistics of a search of the engine, per iteration.
+
+The engine only increments plain integer counters while it searches (`Engine.nodes`,
+`Engine.evaluations`, ...). A `SearchStats` takes a snapshot of them when an iteration starts
+and stores the difference when it ends, so collecting statistics costs nothing per node.
+"""
+
+import time
+
+# Counters of the engine recorded for every iteration
+COUNTERS = (
+    "nodes",
+    "qnodes",
+    "evaluations",
+    "tt_probes",
+    "tt_hits",
+    "tt_cutoffs",
+    "beta_cutoffs",
+    "first_move_cutoffs",
+    "researches",
+    "reductions",
+    "pruned",
+)
+
+
+class SearchStats:
+    """
+    The statistics of one search: the counters of every iteration (one per depth with iterative
+    deepening or aspirational search, a single one for a fixed-depth search) and the result.
+    """
+
+    def __init__(self) -> None:
+        self.iterations = []
+        self.start_time = time.time()
+        self.time = 0.0
+        self.depth = 0
+        self.score = None
+        self.best_move = None
+        self.pv = []
+        self.tt_occupancy = 0
+        self.collisions = 0
+        self._iteration = None
+
+    def start_iteration(self, engine, depth: int) -> None:
+        """Takes a snapshot of the counters of the engine at the start of the iteration searching `depth`."""
+        self._iteration = (
+            depth,
+            time.time(),
+            [getattr(engine, counter) for counter in COUNTERS],
+        )
+
+    def end_iteration(self, engine, completed: bool = True) -> dict:
+        """
+        Records the counters of the iteration started last.
+
+        Parameters:
+            engine (Engine): The engine searching.
+            completed (bool): False when the iteration was aborted by the time limit.
+
+        Returns:
+            dict: The statistics of the iteration.
+        """
+        depth, start_time, start = self._iteration
+        iteration = {"depth": depth, "completed": completed}
+        for counter, value in zip(COUNTERS, start):
+            iteration[counter] = getattr(engine, counter) - value
+        iteration["time"] = time.time() - start_time
+
+        # Effective branching factor: growth of the tree from the previous iteration
+        previous = self.iterations[-1]["nodes"] if self.iterations else 0
+        iteration["branching_factor"] = (
+            iteration["nodes"] / previous if previous else None
+        )
+        iteration["first_move_rate"] = (
+            iteration["first_move_cutoffs"] / iteration["beta_cutoffs"]
+            if iteration["beta_cutoffs"]
+            else None
+        )
+        self.iterations.append(iteration)
+        self._iteration = None
+        return iteration
+
+    def total(self, counter: str) -> int:
+        """Returns the sum of a counter over all the iterations."""
+        return sum(iteration[counter] for iteration in self.iterations)
+
+    def finish(self, engine, depth: int, score, best_move, pv) -> None:
+        """Records the result of the search and the state of the transposition table."""
+        self.time = time.time() - self.start_time
+        self.depth = depth
+        self.score = score
+        self.best_move = best_move
+        self.pv = pv
+        self.tt_occupancy = engine.num_elements
+        self.collisions = engine.collisions
+
+    def to_dict(self) -> dict:
+        """Returns the statistics as a dictionary of plain values, e.g. to be written as JSON."""
+        return {
+            "depth": self.depth,
+            "score": self.score,
+            "best_move": list(self.best_move) if self.best_move is not None else None,
+            "pv": [list(move) for move in self.pv],
+            "time": self.time,
+            "tt_occupancy": self.tt_occupancy,
+            "collisions": self.collisions,
+            **{counter: self.total(counter) for counter in COUNTERS},
+            "iterations": self.iterations,
+        }
+
+    def summary(self) -> str:
+        """Returns a table of the statistics of every iteration, one line per iteration."""
+        lines = [
+            f"{'depth':>5} {'nodes':>9} {'qnodes':>9} {'evals':>9} {'tt hits':>8} {'tt cuts':>8} "
+            f"{'cutoffs':>8} {'first':>6} {'ebf':>6} {'time':>8}"
+        ]
+        for iteration in self.iterations:
+            hits = (
+                f"{iteration['tt_hits'] / iteration['tt_probes']:.1%}"
+                if iteration["tt_probes"]
+                else "-"
+            )
+            first = (
+                f"{iteration['first_move_rate']:.0%}"
+                if iteration["first_move_rate"] is not None
+                else "-"
+            )
+            ebf = (
+                f"{iteration['branching_factor']:.2f}"
+                if iteration["branching_factor"] is not None
+                else "-"
+            )
+            lines.append(
+                f"{iteration['depth']:>5} {iteration['nodes']:>9} {iteration['qnodes']:>9} "
+                f"{iteration['evaluations']:>9} "
+                f"{hits:>8} {iteration['tt_cutoffs']:>8} {iteration['beta_cutoffs']:>8} "
+                f"{first:>6} {ebf:>6} {iteration['time']:>7.3f}s"
+                + ("" if iteration["completed"] else " (aborted)")
+            )
+        return "\n".join(lines)
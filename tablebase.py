@@ -0,0 +1,364 @@
+"""
+Endgame tablebases for the positions with few pieces, built by retrograde analysis.
+
+A table holds the exact result of every position with a given material, from the point of view
+of the side to move: win or loss and the number of plies to the end of the game, or draw.
+The game ends when a piece reaches the last row (its side wins) or when the side to move has
+no legal move (it loses, which includes having no pieces left).
+
+Positions are stored from the point of view of the side to move, moving up the board (towards
+row 0): the positions where it moves down are flipped vertically. A table for `own` pieces of the
+side to move against `opp` pieces of the opponent is a flat int16 array indexed by the
+combinatorial rank of the two sets of squares, so probing a position is O(1). Every table is
+saved in its own file, memory-mapped when the tablebases are loaded.
+
+Run this module to generate the tables with up to K pieces per side (the number of positions
+grows as C(81, K) ** 2, so K = 2 already takes a while):
+
+    python tablebase.py --pieces 2 --directory tablebases
+"""
+
+import argparse
+import os
+import time
+from collections import defaultdict
+from itertools import combinations
+from math import comb
+import numpy as np
+from bitboard import NUM_SQUARES, FULL, ROWS, N, iter_bits, capture_targets, quiet_targets
+from states import Board, PROMOTION_SCORE
+from parameters import TABLEBASE_DIR, TABLEBASE_PIECES
+
+# Score of a won position, minus the plies needed to win (above any heuristic evaluation)
+TABLEBASE_SCORE = 2 * PROMOTION_SCORE
+
+# Header of a table file: magic number, pieces of the side to move and pieces of the opponent
+FILE_MAGIC = 0x46494E434F544231  # "FINCOTB1"
+HEADER_WORDS = 4
+
+# Binomial coefficients C(n, k) used to rank the sets of squares
+BINOM = [[comb(n, k) for k in range(NUM_SQUARES + 1)] for n in range(NUM_SQUARES + 1)]
+
+
+def flip(bb: int) -> int:
+    """Flips a bitboard vertically, swapping row ``i`` with row ``8 - i``."""
+    flipped = 0
+    for i in range(N):
+        flipped |= ((bb >> (i * N)) & ROWS[0]) << ((N - 1 - i) * N)
+    return flipped
+
+
+def rank(bb: int) -> int:
+    """Returns the rank of the set of squares of ``bb`` among the sets of the same size."""
+    value, k = 0, 1
+    for s in iter_bits(bb):
+        value += BINOM[s][k]
+        k += 1
+    return value
+
+
+def table_size(own: int, opp: int) -> int:
+    """Returns the number of entries of the table with `own` pieces against `opp` pieces."""
+    return BINOM[NUM_SQUARES][own] * BINOM[NUM_SQUARES][opp]
+
+
+def index(own: int, opp: int) -> int:
+    """Returns the index of the position in its table, given the bitboards of both sides."""
+    return rank(own) * BINOM[NUM_SQUARES][opp.bit_count()] + rank(opp)
+
+
+def canonical(board: Board):
+    """
+    Returns the bitboards of the side to move and of the opponent, flipped when needed
+    so that the side to move advances towards row 0.
+    """
+    colour = board.turn
+    own, opp = board.pieces[colour], board.pieces[3 - colour]
+    if colour != board.team:
+        own, opp = flip(own), flip(opp)
+    return own, opp
+
+
+def children(own: int, opp: int):
+    """
+    Generates the positions reached by the legal moves of the side to move, honouring the
+    mandatory capture rule. The positions are returned from the point of view of the
+    opponent, flipped so that it advances towards row 0.
+
+    Returns:
+        List[Tuple]: The (own, opp) bitboards of every child position.
+    """
+    empty = FULL ^ (own | opp)
+    positions = []
+    left, right = capture_targets(own, opp, empty, True)
+    if left or right:
+        for targets, delta in ((left, 20), (right, 16)):
+            for s in iter_bits(targets):
+                origin = s + delta
+                middle = (origin + s) // 2
+                moved = own ^ (1 << origin) ^ (1 << s)
+                positions.append((flip(opp & ~(1 << middle)), flip(moved)))
+        return positions
+
+    forward, left, right = quiet_targets(own, empty, True)
+    for targets, delta in ((forward, N), (left, 1), (right, -1)):
+        for s in iter_bits(targets):
+            moved = own ^ (1 << (s + delta)) ^ (1 << s)
+            positions.append((flip(opp), flip(moved)))
+    return positions
+
+
+def score(value: int) -> int:
+    """
+    Converts a table value to a search score: a quicker win scores higher, a slower loss
+    scores higher, and a draw is 0.
+    """
+    if value > 0:
+        return TABLEBASE_SCORE - (value - 1)
+    if value < 0:
+        return -TABLEBASE_SCORE - (value + 1)
+    return 0
+
+
+def solve(materials, solved):
+    """
+    Solves all the positions of the given materials, which must have the same number of pieces,
+    by retrograde analysis. Captures lead to positions with fewer pieces, looked up in `solved`.
+
+    Positions are resolved in order of distance to the end of the game: the terminal ones first,
+    then a position is won at distance d + 1 as soon as one of its children is lost at distance d,
+    and lost at distance d + 1 when all its children are won, the slowest one at distance d.
+    The positions never resolved are draws.
+
+    Values are stored as d + 1 for a position won in d plies, -(d + 1) for one lost in d plies
+    and 0 for a draw (or an impossible position).
+
+    Parameters:
+        materials (List[Tuple]): The (own, opp) numbers of pieces of the tables to solve.
+        solved (dict): The tables with fewer pieces, keyed by (own, opp).
+
+    Returns:
+        dict: The new tables, keyed by (own, opp).
+    """
+    offsets, total = {}, 0
+    for material in materials:
+        offsets[material] = total
+        total += table_size(*material)
+
+    resolved = bytearray(total)
+    values = [0] * total
+    counter = [0] * total
+    longest = [0] * total
+    buckets = defaultdict(list)
+    sources, targets = [], []
+
+    for material in materials:
+        offset = offsets[material]
+        opp_count = material[1]
+        for own_squares in combinations(range(NUM_SQUARES), material[0]):
+            own = sum(1 << s for s in own_squares)
+            base = offset + rank(own) * BINOM[NUM_SQUARES][opp_count]
+            for opp_squares in combinations(range(NUM_SQUARES), opp_count):
+                opp = sum(1 << s for s in opp_squares)
+                if own & opp:
+                    continue
+                position = base + rank(opp)
+
+                # The opponent reached its last row, or this side reached its own
+                if opp & ROWS[N - 1]:
+                    buckets[0].append((position, -1))
+                    continue
+                if own & ROWS[0]:
+                    buckets[0].append((position, 1))
+                    continue
+
+                moves = children(own, opp)
+                if not moves:
+                    buckets[0].append((position, -1))
+                    continue
+                counter[position] = len(moves)
+                for child_own, child_opp in moves:
+                    child = (child_own.bit_count(), child_opp.bit_count())
+                    if child in offsets:
+                        sources.append(position)
+                        targets.append(offsets[child] + index(child_own, child_opp))
+                        continue
+                    value = int(solved[child][index(child_own, child_opp)])
+                    if value < 0:
+                        buckets[-value].append((position, -value + 1))
+                    elif value > 0:
+                        counter[position] -= 1
+                        longest[position] = max(longest[position], value)
+                if counter[position] == 0:
+                    distance = longest[position]
+                    buckets[distance].append((position, -(distance + 1)))
+
+    # Predecessors of every position within these materials
+    sources = np.array(sources, dtype=np.int64)
+    targets = np.array(targets, dtype=np.int64)
+    order = np.argsort(targets, kind="stable")
+    predecessors = sources[order].tolist()
+    starts = np.searchsorted(targets[order], np.arange(total + 1)).tolist()
+
+    distance = 0
+    while distance <= max(buckets, default=-1):
+        for position, value in buckets.pop(distance, []):
+            if resolved[position]:
+                continue
+            resolved[position] = 1
+            values[position] = value
+            for parent in predecessors[starts[position] : starts[position + 1]]:
+                if resolved[parent]:
+                    continue
+                if value < 0:
+                    buckets[distance + 1].append((parent, distance + 2))
+                else:
+                    counter[parent] -= 1
+                    longest[parent] = max(longest[parent], distance + 1)
+                    if counter[parent] == 0:
+                        loss = longest[parent]
+                        buckets[loss].append((parent, -(loss + 1)))
+        distance += 1
+
+    tables = {}
+    for material in materials:
+        start = offsets[material]
+        tables[material] = np.array(
+            values[start : start + table_size(*material)], dtype=np.int16
+        )
+    return tables
+
+
+def table_path(directory: str, own: int, opp: int) -> str:
+    """Returns the path of the file of the table with `own` pieces against `opp` pieces."""
+    return os.path.join(directory, f"{own}v{opp}.tb")
+
+
+def save(path: str, own: int, opp: int, table: np.ndarray) -> None:
+    """Writes a table to a file, after a header with its material."""
+    with open(path, "wb") as f:
+        np.array([FILE_MAGIC, own, opp, 0], dtype=np.uint64).tofile(f)
+        table.astype(np.int16).tofile(f)
+
+
+def generate(directory: str, pieces: int = TABLEBASE_PIECES) -> None:
+    """
+    Generates and saves the tables of all the positions with up to `pieces` pieces per side,
+    from the fewest pieces to the most, printing the progress.
+
+    Parameters:
+        directory (str): Directory where the table files are written.
+        pieces (int): Maximum number of pieces per side.
+    """
+    os.makedirs(directory, exist_ok=True)
+    solved = {}
+    for total in range(1, 2 * pieces + 1):
+        materials = [
+            (own, total - own)
+            for own in range(max(0, total - pieces), min(pieces, total) + 1)
+        ]
+        start_time = time.time()
+        tables = solve(materials, solved)
+        for (own, opp), table in tables.items():
+            save(table_path(directory, own, opp), own, opp, table)
+            print(
+                f"{own}v{opp}: {len(table)} entries, {np.count_nonzero(table > 0)} won, "
+                f"{np.count_nonzero(table < 0)} lost"
+            )
+        print(f"Solved {total} pieces in {time.time() - start_time:.2f} seconds")
+        solved.update(tables)
+
+
+class Tablebase:
+    """
+    The endgame tables found in a directory, memory-mapped and probed during the search.
+    """
+
+    def __init__(self, directory: str = TABLEBASE_DIR) -> None:
+        """
+        Maps every table file of the directory. The tablebase only covers the positions
+        where both sides have at most `pieces` pieces, the largest complete set of tables found.
+
+        Parameters:
+            directory (str): Directory of the table files.
+        """
+        self.tables = {}
+        if directory is not None and os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if not name.endswith(".tb"):
+                    continue
+                path = os.path.join(directory, name)
+                header = np.fromfile(path, dtype=np.uint64, count=HEADER_WORDS)
+                if len(header) < HEADER_WORDS or header[0] != FILE_MAGIC:
+                    continue
+                own, opp = int(header[1]), int(header[2])
+                self.tables[(own, opp)] = np.memmap(
+                    path,
+                    dtype=np.int16,
+                    mode="r",
+                    offset=HEADER_WORDS * 8,
+                    shape=(table_size(own, opp),),
+                )
+
+        self.pieces = 0
+        while all(
+            (own, opp) in self.tables
+            for own in range(self.pieces + 2)
+            for opp in range(self.pieces + 2)
+            if own or opp
+        ):
+            self.pieces += 1
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def probe(self, board: Board):
+        """
+        Looks up the exact score of a position, from the point of view of the side to move.
+
+        Parameters:
+            board (Board): The position to look up.
+
+        Returns:
+            int: The score of the position (see `score`), or None if it is not covered by the tables.
+        """
+        pieces = self.pieces
+        if (
+            board.pieces[1].bit_count() > pieces
+            or board.pieces[2].bit_count() > pieces
+        ):
+            return None
+        own, opp = canonical(board)
+        table = self.tables[(own.bit_count(), opp.bit_count())]
+        return score(int(table[index(own, opp)]))
+
+    def best_move(self, board: Board):
+        """
+        Finds the best move of a position covered by the tables by probing all its children:
+        the quickest win, else a draw, else the slowest loss.
+
+        Parameters:
+            board (Board): The position, unchanged on return.
+
+        Returns:
+            tuple: The score of the position and the best move, or (None, None) if it is not covered
+                   by the tables or has no legal moves.
+        """
+        if self.probe(board) is None:
+            return None, None
+        bestScore, bestMove = None, None
+        for move in board.legal_moves():
+            board.move_pieces(*move)
+            value = -self.probe(board)
+            board.undo_move()
+            if bestScore is None or value > bestScore:
+                bestScore, bestMove = value, move
+        return bestScore, bestMove
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fianco endgame tablebase generator")
+    parser.add_argument("--pieces", type=int, default=TABLEBASE_PIECES)
+    parser.add_argument("--directory", default=TABLEBASE_DIR or "tablebases")
+    args = parser.parse_args()
+    generate(args.directory, args.pieces)
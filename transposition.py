@@ -0,0 +1,248 @@
+import os
+import numpy as np
+from bitboard import SQUARES
+from parameters import BUCKET_SIZE
+from states import ZOBRIST_TABLE, ZOBRIST_TURN
+
+# Bound types stored in the table
+EXACT, LOWER_BOUND, UPPER_BOUND = 1, 2, 3
+
+# Layout of the data word of an entry, from the lowest bit
+SCORE_BITS, FLAG_BITS, DEPTH_BITS, MOVE_BITS, GENERATION_BITS = 32, 2, 8, 14, 8
+FLAG_SHIFT = SCORE_BITS
+DEPTH_SHIFT = FLAG_SHIFT + FLAG_BITS
+MOVE_SHIFT = DEPTH_SHIFT + DEPTH_BITS
+GENERATION_SHIFT = MOVE_SHIFT + MOVE_BITS
+SCORE_OFFSET = 1 << (SCORE_BITS - 1)
+
+# Header of a table file: magic number, size, bucket size, Zobrist keys fingerprint and generation
+HEADER_WORDS = 8
+MAGIC, HEADER_SIZE, HEADER_BUCKET_SIZE, HEADER_FINGERPRINT, HEADER_GENERATION = range(5)
+FILE_MAGIC = 0x46494E434F545431  # "FINCOTT1"
+ZOBRIST_FINGERPRINT = int(np.bitwise_xor.reduce(ZOBRIST_TABLE.ravel())) ^ ZOBRIST_TURN
+
+
+def encode_move(move) -> int:
+    """Encodes a move (oi, oj, i, j) in 14 bits as origin and target square; None is encoded as 0."""
+    if move is None:
+        return 0
+    oi, oj, i, j = move
+    return ((oi * 9 + oj) << 7) | (i * 9 + j)
+
+
+def decode_move(code: int):
+    """Decodes a move encoded with `encode_move`."""
+    if code == 0:
+        return None
+    return SQUARES[code >> 7] + SQUARES[code & 0x7F]
+
+
+class TranspositionTable:
+    """
+    A transposition table packed in two 64-bit words per entry.
+
+    The first word holds the Zobrist key XOR-ed with the data word, so an entry is only
+    returned when both words belong to the same position. The data word packs the score,
+    the bound type, the depth, the best move and the generation (the search that stored it).
+
+    Entries are grouped in buckets of `bucket_size` slots. The first slot of a bucket is
+    depth-preferred: it is only replaced by a search at least as deep, or when it was stored
+    by an older search. The other slots are always-replace, overwriting the shallowest one.
+    The entry of a position already stored is updated by an exact score, a search at least as
+    deep, or any search when it was stored by an older one.
+    """
+
+    def __init__(self, size: int, bucket_size: int = BUCKET_SIZE, table=None) -> None:
+        """
+        Parameters:
+            size (int): Number of entries of the table.
+            bucket_size (int): Number of entries per bucket.
+            table (np.ndarray): Optional (size, 2) uint64 array to use as storage.
+        """
+        self.bucket_size = bucket_size
+        self.num_buckets = size // bucket_size
+        self.size = self.num_buckets * bucket_size
+        if table is None:
+            table = np.zeros((self.size, 2), dtype=np.uint64)
+        self.table = table
+        self.generation = 0
+        # Header of the file backing the table, if any (see `open`)
+        self.header = None
+
+    @classmethod
+    def open(cls, path: str, size: int, bucket_size: int = BUCKET_SIZE):
+        """
+        Opens a table backed by a memory-mapped file, so that its entries survive the process.
+
+        An existing file is reused when it was written with the same size, bucket size and Zobrist keys,
+        and the generation counter is restored from it. Otherwise the file is (re)created empty.
+
+        Parameters:
+            path (str): Path of the table file.
+            size (int): Number of entries of the table.
+            bucket_size (int): Number of entries per bucket.
+
+        Returns:
+            TranspositionTable: The table, with `header` set to the memory-mapped file header.
+        """
+        size = (size // bucket_size) * bucket_size
+        expected = [FILE_MAGIC, size, bucket_size, ZOBRIST_FINGERPRINT]
+        nbytes = (HEADER_WORDS + 2 * size) * 8
+
+        reuse = os.path.exists(path) and os.path.getsize(path) == nbytes
+        header = np.memmap(
+            path, dtype=np.uint64, mode="r+" if reuse else "w+", shape=(HEADER_WORDS,)
+        )
+        if not reuse or header[:4].tolist() != expected:
+            reuse = False
+            header[:] = 0
+            header[:4] = expected
+            header.flush()
+
+        table = np.memmap(
+            path,
+            dtype=np.uint64,
+            mode="r+",
+            offset=HEADER_WORDS * 8,
+            shape=(size, 2),
+        )
+        if not reuse:
+            table[:] = 0
+
+        tt = cls(size, bucket_size, table)
+        tt.header = header
+        tt.generation = int(header[HEADER_GENERATION])
+        return tt
+
+    def flush(self) -> None:
+        """Writes the table to its file, if it is memory-mapped."""
+        if self.header is not None:
+            self.header.flush()
+            self.table.flush()
+
+    def new_search(self) -> None:
+        """Advances the generation counter, making the entries of previous searches replaceable."""
+        self.generation = (self.generation + 1) & ((1 << GENERATION_BITS) - 1)
+        if self.header is not None:
+            self.header[HEADER_GENERATION] = self.generation
+
+    def keep_deepest(self, fraction: float) -> int:
+        """
+        Removes the shallowest entries, keeping (at least) the given fraction of the stored entries,
+        the ones searched the deepest.
+
+        Parameters:
+            fraction (float): Fraction of the stored entries to keep.
+
+        Returns:
+            int: The number of entries left in the table.
+        """
+        data = self.table[:, 1]
+        occupied = data != 0
+        stored = int(np.count_nonzero(occupied))
+        keep = int(stored * fraction)
+        if keep >= stored:
+            return stored
+        depths = (data >> np.uint64(DEPTH_SHIFT)) & np.uint64(0xFF)
+        threshold = np.partition(depths[occupied], stored - keep)[stored - keep]
+        self.table[occupied & (depths < threshold)] = 0
+        return self.occupancy()
+
+    def occupancy(self) -> int:
+        """Returns the number of entries stored in the table."""
+        return int(np.count_nonzero(self.table[:, 1]))
+
+    def clear(self) -> None:
+        """Removes every entry from the table."""
+        self.table.fill(0)
+
+    def probe(self, key: int):
+        """
+        Looks up a position.
+
+        Parameters:
+            key (int): The Zobrist hash of the position.
+
+        Returns:
+            tuple: (score, flag, depth, best_move) of the stored entry, or None if the position is not stored.
+        """
+        table = self.table
+        base = (key % self.num_buckets) * self.bucket_size
+        for slot in range(base, base + self.bucket_size):
+            data = table.item(slot, 1)
+            if table.item(slot, 0) ^ data == key and data:
+                return (
+                    (data & 0xFFFFFFFF) - SCORE_OFFSET,
+                    (data >> FLAG_SHIFT) & 0x3,
+                    (data >> DEPTH_SHIFT) & 0xFF,
+                    decode_move((data >> MOVE_SHIFT) & 0x3FFF),
+                )
+        return None
+
+    def store(self, key: int, score: int, flag: int, depth: int, best_move) -> bool:
+        """
+        Stores the result of a search.
+
+        Parameters:
+            key (int): The Zobrist hash of the position.
+            score (int): The score found by the search.
+            flag (int): EXACT, LOWER_BOUND or UPPER_BOUND.
+            depth (int): The depth of the search.
+            best_move (Tuple): The best move found, or None.
+
+        Returns:
+            bool: True if the entry of a different position was overwritten (a collision).
+        """
+        table = self.table
+        generation = self.generation
+        data = (
+            (int(score) + SCORE_OFFSET)
+            | (flag << FLAG_SHIFT)
+            | (depth << DEPTH_SHIFT)
+            | (encode_move(best_move) << MOVE_SHIFT)
+            | (generation << GENERATION_SHIFT)
+        )
+        base = (key % self.num_buckets) * self.bucket_size
+
+        # The position is already stored: update it in place, unless the stored entry is a deeper
+        # bound of the current search
+        for slot in range(base, base + self.bucket_size):
+            stored = table.item(slot, 1)
+            if table.item(slot, 0) ^ stored == key and stored:
+                if (
+                    flag == EXACT
+                    or (stored >> GENERATION_SHIFT) != generation
+                    or depth >= (stored >> DEPTH_SHIFT) & 0xFF
+                ):
+                    table[slot, 0] = key ^ data
+                    table[slot, 1] = data
+                return False
+
+        # Depth-preferred slot
+        stored = table.item(base, 1)
+        if (
+            self.bucket_size == 1
+            or not stored
+            or (stored >> GENERATION_SHIFT) != generation
+            or depth >= (stored >> DEPTH_SHIFT) & 0xFF
+        ):
+            slot = base
+        else:
+            # Always-replace slots: take an empty one, or the shallowest one, preferring older searches
+            slot, lowest = base + 1, None
+            for candidate in range(base + 1, base + self.bucket_size):
+                stored = table.item(candidate, 1)
+                if not stored:
+                    slot = candidate
+                    break
+                value = (
+                    (stored >> GENERATION_SHIFT) == generation,
+                    (stored >> DEPTH_SHIFT) & 0xFF,
+                )
+                if lowest is None or value < lowest:
+                    slot, lowest = candidate, value
+            stored = table.item(slot, 1)
+
+        table[slot, 0] = key ^ data
+        table[slot, 1] = data
+        return stored != 0
@@ -0,0 +1,230 @@
+"""
+Background search for the pygame interface.
+
+An `EngineWorker` owns the Engine and runs its searches in a thread, so that the event loop of
+the game keeps rendering and handling events while the engine thinks. Search requests are put
+on a request queue, and the worker answers on a response queue, which the interface polls
+without blocking:
+
+    ("progress", request, (depth, score, pv))   after every completed iteration
+    ("result", request, board)                  the board returned by `Engine.think`
+    ("error", request, message)                 the search failed, instead of its result
+
+A search can be cancelled at any time: the engine stops at its next check of the clock and
+plays the best move of the last completed iteration. A cancel applies to the searches
+requested before it, so one still queued answers at once with the first move ordered, and
+the searches requested after it are not affected. `request` is the number returned by
+`EngineWorker.search`, so the answers to a search abandoned by the interface (for example
+after an undo) can be recognised and ignored.
+
+After its move the engine can ponder: it searches the position after the reply it expects
+from the opponent while the opponent thinks. When the opponent plays that reply (a ponder
+hit) the search goes on as the search of the real position, with its time limit starting
+from then. Otherwise (a ponder miss) it is stopped, and the real position is searched with
+the transposition table filled by the pondering.
+"""
+
+import copy
+import logging
+import queue
+import threading
+import time
+from parameters import MIN, MAX
+
+logger = logging.getLogger(__name__)
+
+# Request number of the answers of a search that has not been hit yet, ignored by the interface
+PONDER_REQUEST = 0
+
+
+def position_key(board):
+    """Returns what identifies the position of a board: the pieces and the player to move."""
+    return tuple(board.pieces), board.turn
+
+
+class EngineWorker:
+    """
+    Runs the searches of an engine in a background thread, fed through a request queue.
+    """
+
+    def __init__(self, engine) -> None:
+        """
+        Starts the thread searching with the engine. From then on the engine must only be used
+        through the worker.
+
+        Parameters:
+            engine (Engine): The engine searching the requested positions.
+        """
+        self.engine = engine
+        self.requests = queue.Queue()
+        self.responses = queue.Queue()
+        self.stop = threading.Event()
+        self.engine.stop_event = self.stop
+        self.engine.progress = self._progress
+        # Number of the last search requested, of the one being searched and of the last
+        # search requested before a cancel
+        self.request = 0
+        self.current = None
+        self.cancelled = 0
+        # Pondering: the position searched, the request it answers after a ponder hit,
+        # and its result when the search ended before the opponent played
+        self.lock = threading.Lock()
+        self.ponder_position = None
+        self.ponder_request = None
+        self.ponder_result = None
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def search(self, board, depth: int, time_limit=None) -> int:
+        """
+        Requests the search of a copy of the board. When it is the position being pondered,
+        the pondering search becomes the search of the request instead.
+
+        Parameters:
+            board (Board): The board to search, not shared with the worker.
+            depth (int): The maximum search depth.
+            time_limit (float): Optional time budget in seconds.
+
+        Returns:
+            int: The number of the request, sent back with its answers.
+        """
+        self.request += 1
+        with self.lock:
+            position, self.ponder_position = self.ponder_position, None
+            if position is not None and position == position_key(board):
+                self.ponder_hits += 1
+                logger.info("Ponder hit")
+                if self.ponder_result is not None:
+                    self.responses.put(("result", self.request, self.ponder_result))
+                    self.ponder_result = None
+                else:
+                    self.ponder_request = self.current = self.request
+                    if time_limit is not None:
+                        self.engine.deadline = time.time() + time_limit
+                return self.request
+            if position is not None:
+                self.ponder_misses += 1
+                logger.info("Ponder miss")
+                self.ponder_result = None
+                self.stop.set()
+
+        self.requests.put(("search", self.request, copy.deepcopy(board), depth, time_limit))
+        return self.request
+
+    def ponder(self, board, depth: int) -> bool:
+        """
+        Starts searching the position after the reply expected from the opponent: the second
+        move of the principal variation of the board returned by the last search or, when it
+        is missing, the best move stored in the transposition table. To be called when the
+        result of a search is received, while the engine is idle.
+
+        Parameters:
+            board (Board): The board returned by the last search, with our move applied.
+            depth (int): The maximum search depth.
+
+        Returns:
+            bool: Whether a reply was expected, and is being pondered.
+        """
+        pv = getattr(board, "pv", [])
+        if len(pv) > 1:
+            reply = pv[1]
+        else:
+            replies = self.engine.principal_variation(board, 1)
+            if not replies:
+                return False
+            reply = replies[0]
+
+        board = copy.deepcopy(board)
+        board.move_pieces(*reply)
+        with self.lock:
+            self.ponder_position = position_key(board)
+            self.ponder_request = None
+            self.ponder_result = None
+        self.requests.put(("ponder", PONDER_REQUEST, board, depth, None))
+        return True
+
+    def cancel(self) -> None:
+        """
+        Stops the searches requested so far, which then answer with the best move found so far,
+        and the pondering, if any.
+        """
+        with self.lock:
+            self.cancelled = self.request
+            self.ponder_position = None
+            self.ponder_result = None
+            self.stop.set()
+        if self.engine.smp is not None:
+            self.engine.smp.stop.set()
+
+    def poll(self):
+        """
+        Returns the answers received since the last call, without waiting.
+
+        Returns:
+            List[Tuple]: The (kind, request, data) answers, in the order they were sent.
+        """
+        answers = []
+        while True:
+            try:
+                answers.append(self.responses.get_nowait())
+            except queue.Empty:
+                return answers
+
+    def close(self) -> None:
+        """Cancels the current search, waits for the thread to finish and closes the engine."""
+        self.cancel()
+        self.requests.put(None)
+        self.thread.join()
+        self.engine.close()
+
+    def _progress(self, depth: int, score, pv) -> None:
+        """Sends the result of an iteration of the current search to the interface."""
+        self.responses.put(("progress", self.current, (depth, score, pv)))
+
+    def _run(self) -> None:
+        """
+        Main loop of the thread: searches the requested boards until it receives None. A search
+        that fails is answered with an error, and the thread goes on with the next request.
+        """
+        while True:
+            task = self.requests.get()
+            if task is None:
+                break
+            kind, request, board, depth, time_limit = task
+            with self.lock:
+                if kind == "ponder":
+                    if self.ponder_position is None and self.ponder_request is None:
+                        # Pondering abandoned before it started
+                        continue
+                    if self.ponder_request is not None:
+                        request = self.ponder_request
+                if request == PONDER_REQUEST or request > self.cancelled:
+                    self.stop.clear()
+                else:
+                    # Cancelled while it was queued: answered with the first move ordered
+                    self.stop.set()
+                self.current = request
+            try:
+                answer = ("result", self.engine.think(board, depth, MIN, MAX, time_limit=time_limit))
+            except Exception as error:
+                logger.exception("Search failed")
+                self.engine.deadline = None
+                answer = ("error", f"{type(error).__name__}: {error}")
+            with self.lock:
+                if kind == "ponder":
+                    # The deadline set by a ponder hit after the search ended must not stop the next one
+                    self.engine.deadline = None
+                    if self.ponder_request is not None:
+                        request, self.ponder_request = self.ponder_request, None
+                    else:
+                        # Kept for a ponder hit, unless the pondering was abandoned or failed
+                        if answer[0] == "error":
+                            self.ponder_position = None
+                        elif self.ponder_position is not None:
+                            self.ponder_result = answer[1]
+                        request = None
+                if request is not None:
+                    self.responses.put((answer[0], request, answer[1]))
+                self.current = None